@@ -1,8 +1,7 @@
-from ib_insync import IB
+from bot.session import get_ib
 
 def account_summary():
-    ib = IB()
-    ib.connect('127.0.0.1', 4001, clientId=10)
+    ib = get_ib()
 
     summaries = ib.accountSummary()
     # Extract balances for CAD and USD
@@ -11,8 +10,6 @@ def account_summary():
     cash_usd = next((float(s.value) for s in summaries
                      if s.tag == 'CashBalance' and s.currency == 'USD'), 0.0)
 
-    ib.disconnect()
-
     return (
         f"💵 CAD Cash: {cash_cad:.2f} CAD\n"
         f"💵 USD Cash: {cash_usd:.2f} USD"
@@ -0,0 +1,73 @@
+import os
+import asyncio
+import logging
+from dotenv import load_dotenv
+from bot.parser import parse_locally, extract_messages_async
+
+load_dotenv()
+logger = logging.getLogger('ibkr')
+
+BATCH_WINDOW = float(os.getenv("LLM_BATCH_WINDOW", 0.35))  # seconds, 0 disables coalescing
+BATCH_MAX = int(os.getenv("LLM_BATCH_MAX", 6))
+
+
+class MessageBatcher:
+    # Coalesces a burst of messages from one author into a single LLM call.
+    # Messages that resolve locally never wait for the window. Every caller
+    # gets back its own message's trades, in posting order.
+    def __init__(self, local=parse_locally, parse=extract_messages_async, window=BATCH_WINDOW, max_size=BATCH_MAX):
+        self.local = local
+        self.parse = parse
+        self.window = window
+        self.max_size = max_size
+        self._pending = {}
+        self._timers = {}
+        self.batches = 0
+        self.messages = 0
+
+    async def submit(self, author, text):
+        trades = self.local(text)
+        if trades is not None:
+            return trades
+        if self.window <= 0:
+            return (await self.parse([text]))[0]
+        future = asyncio.get_running_loop().create_future()
+        batch = self._pending.setdefault(author, [])
+        batch.append((text, future))
+        if len(batch) >= self.max_size:
+            self._flush_now(author)
+        elif author not in self._timers:
+            self._timers[author] = asyncio.get_running_loop().call_later(self.window, self._flush_now, author)
+        return await future
+
+    def _flush_now(self, author):
+        timer = self._timers.pop(author, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(author, [])
+        if batch:
+            asyncio.ensure_future(self._flush(batch))
+
+    async def _flush(self, batch):
+        self.batches += 1
+        self.messages += len(batch)
+        if len(batch) > 1:
+            logger.info(f"📦 Parsing a burst of {len(batch)} messages in one call")
+        try:
+            results = await self.parse([text for text, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        # Resolved in posting order, so waiters resume (and queue trades) in that order
+        for (_, future), trades in zip(batch, results):
+            if not future.done():
+                future.set_result(trades)
+
+    def report(self):
+        average = self.messages / self.batches if self.batches else 0.0
+        return f"📦 Batching: {self.messages} messages in {self.batches} calls ({average:.1f} per call)"
+
+
+batcher = MessageBatcher()
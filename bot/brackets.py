@@ -0,0 +1,118 @@
+import os
+import logging
+from dotenv import load_dotenv
+from bot.pricing import round_tick
+
+load_dotenv()
+logger = logging.getLogger('ibkr')
+
+BRACKET_ENTRIES = os.getenv("BRACKET_ENTRIES", "false").lower() == "true"
+TAKE_PROFIT_PCT = float(os.getenv("BRACKET_TP_PCT", 50))
+STOP_LOSS_PCT = float(os.getenv("BRACKET_SL_PCT", 30))
+# Reduce the sibling by the filled size without blocking, so partial fills stay consistent
+OCA_TYPE = 3
+LIVE_STATES = ("PendingSubmit", "PreSubmitted", "Submitted", "ApiPending")
+
+
+def exit_prices(entry, tp_pct=TAKE_PROFIT_PCT, sl_pct=STOP_LOSS_PCT):
+    return round_tick(entry * (1 + tp_pct / 100)), round_tick(entry * (1 - sl_pct / 100))
+
+
+class BracketGroup:
+    # One BUY entry with its OCA pair of exits
+    def __init__(self, oca_group, parent, take_profit, stop_loss):
+        self.oca_group = oca_group
+        self.parent = parent
+        self.take_profit = take_profit
+        self.stop_loss = stop_loss
+
+    def live(self):
+        return [t for t in (self.take_profit, self.stop_loss) if t.orderStatus.status in LIVE_STATES]
+
+    @property
+    def quantity(self):
+        # Exit size still resting (OCA type 3 keeps both children at the same size),
+        # capped by what the entry has actually bought so far
+        resting = max((t.order.totalQuantity - t.orderStatus.filled for t in self.live()), default=0)
+        return min(resting, self.parent.orderStatus.filled)
+
+
+class Brackets:
+    # Broker-side take-profit + stop children attached to BUY entries, kept in
+    # step with later trims.
+    def __init__(self):
+        self._groups = {}
+
+    def groups(self, con_id):
+        # Oldest first, only those with a live exit left
+        groups = [g for g in self._groups.get(con_id, []) if g.live()]
+        self._groups[con_id] = groups
+        return groups
+
+    def children(self, con_id):
+        return [t for g in self.groups(con_id) for t in g.live()]
+
+    def submit(self, ib, contract, quantity, entry, account, tp_pct=TAKE_PROFIT_PCT, sl_pct=STOP_LOSS_PCT):
+        take_profit, stop_loss = exit_prices(entry, tp_pct, sl_pct)
+        bracket = ib.bracketOrder("BUY", quantity, entry, take_profit, stop_loss)
+        oca_group = f"bracket-{bracket.parent.orderId}"
+        for order in bracket:
+            order.account = account
+            order.outsideRth = True
+        for child in (bracket.takeProfit, bracket.stopLoss):
+            child.ocaGroup = oca_group
+            child.ocaType = OCA_TYPE
+
+        parent = ib.placeOrder(contract, bracket.parent)
+        tp = ib.placeOrder(contract, bracket.takeProfit)
+        sl = ib.placeOrder(contract, bracket.stopLoss)
+        # Later modifications (chasing, trims) must go out on their own
+        for order in bracket:
+            order.transmit = True
+
+        self._groups.setdefault(contract.conId, []).append(BracketGroup(oca_group, parent, tp, sl))
+        parent.filledEvent += lambda t: self._rebase(ib, t, tp, sl, tp_pct, sl_pct)
+        logger.info(f"🪤 Bracket {oca_group}: BUY {quantity} @ {entry} | TP {take_profit} | SL {stop_loss}")
+        return parent
+
+    def _rebase(self, ib, parent, tp, sl, tp_pct, sl_pct):
+        # Anchor the exits on the real fill price once the (possibly chased) entry fills
+        fill = parent.orderStatus.avgFillPrice
+        if not fill:
+            return
+        take_profit, stop_loss = exit_prices(fill, tp_pct, sl_pct)
+        if tp.orderStatus.status in LIVE_STATES and tp.order.lmtPrice != take_profit:
+            tp.order.lmtPrice = take_profit
+            ib.placeOrder(tp.contract, tp.order)
+        if sl.orderStatus.status in LIVE_STATES and sl.order.auxPrice != stop_loss:
+            sl.order.auxPrice = stop_loss
+            ib.placeOrder(sl.contract, sl.order)
+        logger.info(f"🪤 Bracket rebased on fill {fill}: TP {take_profit} | SL {stop_loss}")
+
+    def after_sell(self, ib, sell, held_quantity):
+        # Exits are only shrunk as the trim actually fills, so a trim that never
+        # fills leaves the position fully protected
+        con_id = sell.contract.conId
+        if not self.groups(con_id):
+            return
+        sell.fillEvent += lambda t, fill: self.resize(ib, con_id, held_quantity - t.orderStatus.filled)
+
+    def resize(self, ib, con_id, remaining):
+        # Share what is still held across the groups, oldest first, so the
+        # resting exits never add up to more than the position
+        left = max(remaining, 0)
+        for group in self.groups(con_id):
+            if not group.parent.orderStatus.filled:
+                continue  # entry not filled yet, it is not part of the position being trimmed
+            target = min(group.quantity, left)
+            left -= target
+            for child in group.live():
+                if target <= 0:
+                    ib.cancelOrder(child.order)
+                elif child.order.totalQuantity - child.orderStatus.filled != target:
+                    child.order.totalQuantity = child.orderStatus.filled + target
+                    ib.placeOrder(child.contract, child.order)
+            logger.info(f"🪤 Bracket {group.oca_group} exits resized to {target:g}")
+
+
+brackets = Brackets()
@@ -0,0 +1,196 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from ib_insync import Option, Stock
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger('ibkr')
+
+CACHE_FILE = os.getenv("CONTRACT_CACHE_FILE", os.path.join("config", "contract_cache.json"))
+CACHE_TTL = float(os.getenv("CONTRACT_CACHE_TTL", 7 * 24 * 3600))
+CACHE_SIZE = int(os.getenv("CONTRACT_CACHE_SIZE", 2000))
+
+# Startup prewarm: nearest N expiries and +/- M strikes around spot per symbol
+WATCHLIST = [s.strip().upper() for s in os.getenv("CONTRACT_WATCHLIST", "QQQ,SPY").split(",") if s.strip()]
+WATCH_EXPIRIES = int(os.getenv("CONTRACT_WATCH_EXPIRIES", 2))
+WATCH_STRIKES = int(os.getenv("CONTRACT_WATCH_STRIKES", 8))
+
+
+def contract_key(symbol, expiry, strike, right):
+    return (symbol.strip().upper(), str(expiry).strip(), round(float(strike), 2), right.strip().upper()[:1])
+
+
+def _to_json(key, contract, ts):
+    return {
+        "key": list(key),
+        "conId": contract.conId,
+        "exchange": contract.exchange,
+        "currency": contract.currency,
+        "localSymbol": contract.localSymbol,
+        "tradingClass": contract.tradingClass,
+        "multiplier": contract.multiplier,
+        "ts": ts,
+    }
+
+
+def _from_json(row):
+    symbol, expiry, strike, right = row["key"]
+    contract = Option(
+        symbol, expiry, strike, right,
+        exchange=row.get("exchange") or "SMART",
+        currency=row.get("currency") or "USD",
+        multiplier=row.get("multiplier") or "",
+        localSymbol=row.get("localSymbol") or "",
+        tradingClass=row.get("tradingClass") or "",
+        conId=row["conId"],
+    )
+    return contract_key(symbol, expiry, strike, right), contract, row.get("ts", 0)
+
+
+class ContractCache:
+    # (symbol, expiry, strike, right) -> qualified Option, with TTL + LRU
+    # eviction and a JSON snapshot so restarts start warm.
+    def __init__(self, path=CACHE_FILE, ttl=CACHE_TTL, max_size=CACHE_SIZE):
+        self.path = path
+        self.ttl = ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.load()
+
+    def _expired(self, key, ts):
+        if time.time() - ts > self.ttl:
+            return True
+        expiry = key[1]
+        return expiry.isdigit() and len(expiry) == 8 and expiry < datetime.now().strftime("%Y%m%d")
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                rows = json.load(f)
+            with self._lock:
+                for row in rows:
+                    key, contract, ts = _from_json(row)
+                    if not self._expired(key, ts):
+                        self._entries[key] = (contract, ts)
+            logger.info(f"📂 Loaded {len(self._entries)} cached contracts from {self.path}")
+        except Exception as e:
+            logger.warning(f"⚠️ Could not load contract cache {self.path}: {e}")
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            rows = [_to_json(k, c, ts) for k, (c, ts) in self._entries.items()]
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(rows, f)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not save contract cache {self.path}: {e}")
+
+    def lookup(self, symbol, expiry, strike, right):
+        key = contract_key(symbol, expiry, strike, right)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            contract, ts = entry
+            if self._expired(key, ts):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return contract
+
+    def put(self, contract):
+        if not contract.conId:
+            return
+        key = contract_key(contract.symbol, contract.lastTradeDateOrContractMonth, contract.strike, contract.right)
+        with self._lock:
+            self._entries[key] = (contract, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    async def get_async(self, ib, symbol, expiry, strike, right):
+        contract = self.lookup(symbol, expiry, strike, right)
+        if contract is not None:
+            self.hits += 1
+            return contract
+        self.misses += 1
+        contract = Option(symbol, expiry, strike, right, exchange="SMART", currency="USD")
+        await ib.qualifyContractsAsync(contract)
+        if not contract.conId:
+            raise ValueError("Contract qualification failed")
+        self.put(contract)
+        self.save()
+        return contract
+
+    async def prewarm(self, ib, held=(), watchlist=WATCHLIST):
+        # Held positions already carry a conId, they only need a routable exchange
+        for contract in held:
+            if contract.secType == "OPT" and contract.conId:
+                if not self.lookup(contract.symbol, contract.lastTradeDateOrContractMonth, contract.strike, contract.right):
+                    self.put(Option(
+                        contract.symbol, contract.lastTradeDateOrContractMonth, contract.strike, contract.right,
+                        exchange="SMART", currency=contract.currency or "USD", multiplier=contract.multiplier,
+                        localSymbol=contract.localSymbol, tradingClass=contract.tradingClass, conId=contract.conId,
+                    ))
+
+        pending = []
+        for symbol in watchlist:
+            try:
+                pending += await self._watch_contracts(ib, symbol)
+            except Exception as e:
+                logger.warning(f"⚠️ Prewarm skipped {symbol}: {e}")
+
+        if pending:
+            await ib.qualifyContractsAsync(*pending)
+            for contract in pending:
+                self.put(contract)
+        self.save()
+        logger.info(f"🔥 Contract cache prewarmed: {len(self._entries)} contracts")
+
+    async def _watch_contracts(self, ib, symbol):
+        stock = Stock(symbol, "SMART", "USD")
+        await ib.qualifyContractsAsync(stock)
+        [ticker] = await ib.reqTickersAsync(stock)
+        spot = ticker.marketPrice()
+        if spot != spot:
+            spot = ticker.close
+        if not spot or spot != spot:
+            raise ValueError("no reference price")
+
+        chains = await ib.reqSecDefOptParamsAsync(symbol, "", "STK", stock.conId)
+        chain = next((c for c in chains if c.exchange == "SMART" and c.tradingClass == symbol), None)
+        if chain is None:
+            raise ValueError("no SMART option chain")
+
+        today = datetime.now().strftime("%Y%m%d")
+        expiries = sorted(e for e in chain.expirations if e >= today)[:WATCH_EXPIRIES]
+        strikes = sorted(chain.strikes, key=lambda k: abs(k - spot))[:WATCH_STRIKES * 2 + 1]
+
+        contracts = []
+        for expiry in expiries:
+            for strike in strikes:
+                for right in ("C", "P"):
+                    if self.lookup(symbol, expiry, strike, right) is None:
+                        contracts.append(Option(symbol, expiry, strike, right, exchange="SMART", currency="USD"))
+        return contracts
+
+    def stats(self):
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+contracts = ContractCache()
@@ -8,18 +8,30 @@ from discord import Intents, Message, Interaction
 from discord.ui import View, button, Button
 import asyncio
 from dotenv import load_dotenv
-from bot.ocr import ocr_from_screenshot
-from bot.parser import parse_message
-from bot.trading import submit_trade, handle_trade
+from bot.ocr import ocr_pool
+from bot.batcher import batcher
+from bot.parser import llm
+from bot.triage import triage
+from bot.warmup import readiness
+from bot import fastpath
+from bot.llmcache import decisions
+from bot.prompt import stats as prompt_stats
+from bot.trading import handle_trade, connect_ib, cancel_pending_orders, flatten_positions
+from bot.marketdata import market_data
+from bot.exits import exits
+from bot.portfolio import portfolio
+from bot.contracts import contracts
+from bot.scheduler import scheduler
+from bot.session import run_helper
 from queuelookup import queuelookup
-from clearpositions import clearpositions
+from clearpositions import flatten_report
 from checkpnl import check_pnl
 from checkpos import check_positions
-from clearpendingorders import cancel_pending_orders
+from clearpendingorders import cancel_report
 from convertmoney import convertcurrency
 from getexecutions import list_contract_fills
 from accountsummary import account_summary
-from pnlday import get_realized_pnl_today
+from pnlday import get_realized_pnl_today, get_realized_pnl_week
 
 load_dotenv()
 logging.basicConfig(level=logging.INFO)
@@ -35,24 +47,32 @@ intents.message_content = True
 intents.guilds = True
 bot = commands.Bot(command_prefix="!", intents=intents)
 
-trade_queue = asyncio.Queue()
-trade_lock = asyncio.Lock()
 
 class ActionView(View):
     def __init__(self):
         super().__init__(timeout=None)
 
     async def _send_blocking(self, interaction, func):
-        loop = asyncio.get_running_loop()
         try:
-            result = await asyncio.wait_for(loop.run_in_executor(None, func), timeout=8)
+            result = await asyncio.wait_for(run_helper(func), timeout=8)
             await interaction.response.send_message(result, ephemeral=True)
         except asyncio.TimeoutError:
             await interaction.response.send_message("⏳ Request timed out.", ephemeral=True)
 
+    async def _send_async(self, interaction, func):
+        # Shielded: a timeout must not cancel a flatten between pulling the
+        # resting orders and sending the closing ones, the result follows later
+        task = asyncio.ensure_future(func())
+        try:
+            result = await asyncio.wait_for(asyncio.shield(task), timeout=15)
+            await interaction.response.send_message(result, ephemeral=True)
+        except asyncio.TimeoutError:
+            await interaction.response.send_message("⏳ Still working, the result will follow.", ephemeral=True)
+            await interaction.followup.send(await task, ephemeral=True)
+
     @button(label="✅ Clear Position")
     async def clear(self, interaction: Interaction, button: Button):
-        await self._send_blocking(interaction, clearpositions)
+        await self._send_async(interaction, clear_positions)
 
     @button(label="📊 Check Positions")
     async def check(self, interaction: Interaction, button: Button):
@@ -64,7 +84,7 @@ class ActionView(View):
 
     @button(label="❌ Cancel Pending")
     async def cancel(self, interaction: Interaction, button: Button):
-        await self._send_blocking(interaction, cancel_pending_orders)
+        await self._send_async(interaction, cancel_pending)
 
     @button(label="💵 Convert USD/CAD")
     async def convert(self, interaction: Interaction, button: Button):
@@ -88,6 +108,10 @@ class ActionView(View):
             "• `cancel pending` → Cancels all unfilled orders\n"
             "• `summary` → Shows account value, buying power\n"
             "• `how much did i make` → Today's realized PnL\n"
+            "• `how much this week` → This week's realized PnL\n"
+            "• `lanes` → Trade queue depth and wait per contract\n"
+            "• `startup` → Import time and warm-up status\n"
+            "• `ocr stats` → Screenshot queue depth and OCR time\n"
             "• `menu` → Brings up this interactive menu"
         )
         await interaction.response.send_message(guide, ephemeral=True)
@@ -96,23 +120,63 @@ class ActionView(View):
 async def menu(ctx):
     await ctx.send("Choose an action:", view=ActionView())
 
-async def trade_worker():
-    while True:
-        trade = await trade_queue.get()
-        try:
-            loop = asyncio.get_running_loop()
-            result = await loop.run_in_executor(None, handle_trade, trade)
-            print(f"✅ Trade completed: {result}")
-        except Exception as e:
-            print(f"🔥 Trade execution failed: {str(e)}")
-        finally:
-            trade_queue.task_done()
+async def execute_and_report(channel, trade):
+    try:
+        result = await handle_trade(trade)
+        msg = f"✅ {result.order.action} {result.order.totalQuantity} {result.contract.localSymbol}"
+        await channel.send(msg)
+        await channel.send(await run_helper(check_positions))
+    except Exception as e:
+        await channel.send(f"❌ Order failed: {e}")
+
+async def queue_trade(trade):
+    try:
+        result = await handle_trade(trade)
+        print(f"✅ Trade completed: {result}")
+    except Exception as e:
+        print(f"🔥 Trade execution failed: {str(e)}")
+
+async def reply(channel, func):
+    # Blocking IB helpers run on the helper thread, never on the bot's loop
+    try:
+        await channel.send(await run_helper(func))
+    except Exception as e:
+        await channel.send(f"❌ {e}")
+
+async def reply_async(channel, func):
+    try:
+        await channel.send(await func())
+    except Exception as e:
+        await channel.send(f"❌ {e}")
+
+async def clear_positions():
+    return flatten_report(await flatten_positions())
+
+async def cancel_pending():
+    return cancel_report(await cancel_pending_orders())
+
+async def broadcast(msg):
+    channel = bot.get_channel(BROADCAST_CHANNEL_ID)
+    if channel:
+        await channel.send(msg)
 
 @bot.event
 async def on_ready():
     print(f"[✓] Logged in as {bot.user}")
-    asyncio.create_task(trade_worker())
-    asyncio.create_task(monitor_positions())
+    try:
+        # Stream positions and quotes on the bot's own loop
+        ib = await connect_ib()
+        held = [pos.contract for pos in portfolio.snapshot().records]
+        asyncio.create_task(contracts.prewarm(ib, held))
+        # Stops / targets are evaluated on every tick of a held contract
+        exits.attach(ib, portfolio, market_data, alert=broadcast)
+    except Exception as e:
+        print(f"⚠️ Portfolio stream unavailable: {e}")
+    # Open the OpenAI connection pool and load tesseract in the background
+    asyncio.create_task(readiness.warm_up({
+        "openai": lambda: llm.async_client.models.retrieve(llm.model_name),
+        "tesseract": ocr_pool.warm_up,
+    }))
     ch = bot.get_channel(BROADCAST_CHANNEL_ID)
     if ch:
         await ch.send("✅ iiiii aaaammmmmmmmm reeeaaaadyyyyyy!")
@@ -141,117 +205,49 @@ async def on_message(message: Message):
         lowered = output.lower()
         command_map = {
             "menu": lambda: message.channel.send("Choose an action:", view=ActionView()),
-            "clear pos": lambda: message.channel.send(clearpositions()),
-            "pnl": lambda: message.channel.send(check_pnl()),
-            "check pos": lambda: message.channel.send(check_positions()),
-            "summary": lambda: message.channel.send(account_summary()),
-            "queue": lambda: message.channel.send(queuelookup()),
+            "clear pos": lambda: reply_async(message.channel, clear_positions),
+            "pnl": lambda: reply(message.channel, check_pnl),
+            "check pos": lambda: reply(message.channel, check_positions),
+            "summary": lambda: reply(message.channel, account_summary),
+            "lanes": lambda: message.channel.send(scheduler.report()),
+            "startup": lambda: message.channel.send(readiness.report()),
+            "ocr stats": lambda: message.channel.send(ocr_pool.report()),
+            "parser stats": lambda: message.channel.send(f"{fastpath.stats.report()}\n{decisions.report()}\n{prompt_stats.report()}\n{batcher.report()}\n{triage.report()}"),
+            "queue": lambda: reply(message.channel, queuelookup),
             "tyyy": lambda: message.channel.send("ur welcome! good luck bae <3"),
-            "cancel pending": lambda: message.channel.send(cancel_pending_orders()),
-            "how much did i make": lambda: message.channel.send(get_realized_pnl_today())
+            "cancel pending": lambda: reply_async(message.channel, cancel_pending),
+            "how much did i make": lambda: reply(message.channel, get_realized_pnl_today),
+            "how much this week": lambda: reply(message.channel, get_realized_pnl_week)
         }
         for key, action in command_map.items():
             if key in lowered:
                 await action()
                 return
 
-        # Parse trade from message content
-        trades = parse_message(output)
+        # Parse trade from message content, bursts from one author share an LLM call
+        trades = await batcher.submit(message.author.id, output)
         if trades:
-            async with trade_lock:
-                for trade in trades:
-                    try:
-                        result = await asyncio.get_running_loop().run_in_executor(None, handle_trade, trade)
-                        msg = f"✅ {result.order.action} {result.order.totalQuantity} {result.contract.localSymbol}"
-                        await message.channel.send(msg)
-                        await asyncio.sleep(1)
-                        await message.channel.send(await asyncio.get_running_loop().run_in_executor(None, check_positions))
-                    except Exception as e:
-                        await message.channel.send(f"❌ Order failed: {e}")
+            # Same contract stays in order (BUY before SELL), other contracts run in parallel
+            await asyncio.gather(*[
+                scheduler.submit(trade, lambda t: execute_and_report(message.channel, t))
+                for trade in trades
+            ])
 
     for attachment in message.attachments:
         if attachment.content_type and attachment.content_type.startswith('image'):
             try:
                 image_data = await attachment.read()
-                text = ocr_from_screenshot(image_data)
-                trades = parse_message(text)
-                if trades:
-                    async with trade_lock:
-                        for trade in trades:
-                            await trade_queue.put(trade)
-                            await message.channel.send(f"⏳ Queued trade from image: {trade}")
+                text = await ocr_pool.run(image_data)
+                trades = await batcher.submit(message.author.id, text)
+                for trade in trades:
+                    scheduler.submit(trade, queue_trade)
+                    await message.channel.send(f"⏳ Queued trade from image: {trade}")
             except Exception as e:
                 await message.channel.send(f"❌ Failed to process image: {e}")
 
 
-async def monitor_positions():
-    while True:
-        try:
-            # Get current positions as formatted string
-            positions_str = await asyncio.get_running_loop().run_in_executor(None, check_positions)
-
-            if "No open positions" in positions_str:
-                channel = bot.get_channel(BROADCAST_CHANNEL_ID)
-                if channel:
-                    await channel.send("noooooo positions")
-                await asyncio.sleep(300)
-                continue
-
-            clearance_triggered = False
-            messages = []
-
-            # Parse each position line
-            for line in positions_str.split('\n'):
-                if not line.startswith('📌'):
-                    continue
-
-                # Extract position data
-                parts = [p.strip() for p in line.split('|')]
-                symbol = parts[0].split('📌')[1].split()[0].strip()
-
-                try:
-                    # Extract average cost and market price
-                    avg_cost = float(parts[3].split(':')[1].strip())
-                    market_price = float(parts[4].split(':')[1].strip())
-                    market_price*=100
-
-                    # Calculate profit percentage (SIMPLIFIED)
-                    profit_pct = (market_price - avg_cost) / avg_cost * 100
-
-                    # Check thresholds
-                    if profit_pct <= -30:
-                        messages.append(
-                            f"🚨 **{symbol}** hit LOSS threshold: {profit_pct:.1f}% "
-                            f"(Cost: {avg_cost:.2f} | Current: {market_price:.2f})"
-                        )
-                        clearance_triggered = True
-
-                    elif profit_pct >= 50:
-                        messages.append(
-                            f"🎯 **{symbol}** hit GAIN threshold: {profit_pct:.1f}% "
-                            f"(Cost: {avg_cost:.2f} | Current: {market_price:.2f})"
-                        )
-                        clearance_triggered = True
-
-                except (ValueError, IndexError):
-                    continue  # Skip if parsing fails
-
-            # Take action if thresholds hit
-            if clearance_triggered:
-                channel = bot.get_channel(BROADCAST_CHANNEL_ID)
-                if channel:
-                    for msg in messages:
-                        await channel.send(msg)
-            else:
-                channel = bot.get_channel(BROADCAST_CHANNEL_ID)
-                if channel:
-                    await channel.send("nah ur fine")
-
-        except Exception as e:
-            print(f"⚠️ Monitoring error: {e}")
-        finally:
-            await asyncio.sleep(300)  # Check every 10 seconds
-
-
 def start_bot():
-    bot.run(DISCORD_TOKEN)
\ No newline at end of file
+    try:
+        bot.run(DISCORD_TOKEN)
+    finally:
+        ocr_pool.shutdown()
\ No newline at end of file
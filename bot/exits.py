@@ -0,0 +1,150 @@
+import os
+import json
+import asyncio
+import logging
+from dataclasses import dataclass, replace
+from dotenv import load_dotenv
+from bot.orders import flatten_all
+
+load_dotenv()
+logger = logging.getLogger('ibkr')
+
+STOP_PCT = float(os.getenv("EXIT_STOP_PCT", -30))
+TARGET_PCT = float(os.getenv("EXIT_TARGET_PCT", 50))
+TRAIL_PCT = float(os.getenv("EXIT_TRAIL_PCT", 0))      # 0 disables trailing
+AUTO_CLOSE = os.getenv("EXIT_AUTO_CLOSE", "false").lower() == "true"
+RULES_FILE = os.getenv("EXIT_RULES_FILE", os.path.join("config", "exit_rules.json"))
+
+
+@dataclass(frozen=True)
+class ExitRule:
+    stop_pct: float = STOP_PCT
+    target_pct: float = TARGET_PCT
+    trail_pct: float = TRAIL_PCT
+    auto_close: bool = AUTO_CLOSE
+
+
+def load_rules(path=RULES_FILE):
+    # {"QQQ": {"stop_pct": -20}, "QQQ   250627P00560000": {"auto_close": true}}
+    # Keys are a localSymbol or an underlying symbol, missing fields use the defaults.
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as f:
+            raw = json.load(f)
+        return {key.upper(): replace(ExitRule(), **values) for key, values in raw.items()}
+    except Exception as e:
+        logger.warning(f"⚠️ Could not load exit rules {path}: {e}")
+        return {}
+
+
+class ExitEngine:
+    # Evaluates stop / target / trailing rules on every tick of a held
+    # contract and optionally flattens it right away.
+    def __init__(self, rules=None, default=ExitRule()):
+        self.rules = load_rules() if rules is None else rules
+        self.default = default
+        self.alert = None
+        self._ib = None
+        self._portfolio = None
+        self._market_data = None
+        self._watched = {}
+        self._peaks = {}
+        self._fired = set()
+
+    def rule_for(self, record):
+        return self.rules.get(record.local_symbol.upper()) or self.rules.get(record.symbol.upper()) or self.default
+
+    def attach(self, ib, portfolio, market_data, alert=None):
+        if self._ib is ib:
+            return
+        self._ib = ib
+        self._portfolio = portfolio
+        self._market_data = market_data
+        self.alert = alert
+        ib.positionEvent += self._on_position
+        market_data.resubscribedEvent += self._on_resubscribed
+        for record in portfolio.snapshot().records:
+            self._watch(record.contract)
+        logger.info(f"🎯 Exit engine watching {len(self._watched)} positions")
+
+    def _watch(self, contract):
+        con_id = contract.conId
+        if con_id in self._watched:
+            return
+        ticker = self._market_data.subscribe(contract, pin=True)
+
+        def on_tick(t, con_id=con_id):
+            self._evaluate(con_id, t)
+
+        ticker.updateEvent += on_tick
+        self._watched[con_id] = (ticker, on_tick)
+
+    def _on_resubscribed(self):
+        # Move every tick handler onto the ticker that replaced the old one
+        for con_id, (ticker, handler) in list(self._watched.items()):
+            fresh = self._market_data.ticker(con_id)
+            if fresh is None or fresh is ticker:
+                continue
+            ticker.updateEvent -= handler
+            fresh.updateEvent += handler
+            self._watched[con_id] = (fresh, handler)
+
+    def _unwatch(self, con_id):
+        watched = self._watched.pop(con_id, None)
+        if watched:
+            ticker, handler = watched
+            ticker.updateEvent -= handler
+        self._peaks.pop(con_id, None)
+        self._fired.discard(con_id)
+
+    def _on_position(self, pos):
+        if pos.position:
+            self._watch(pos.contract)
+        else:
+            self._unwatch(pos.contract.conId)
+
+    def _evaluate(self, con_id, ticker):
+        if con_id in self._fired:
+            return
+        record = self._portfolio.get(con_id)
+        if record is None or not record.quantity:
+            return
+        pct = record.with_mark(ticker.marketPrice()).pnl_pct
+        if pct is None:
+            return
+
+        rule = self.rule_for(record)
+        peak = max(self._peaks.get(con_id, pct), pct)
+        self._peaks[con_id] = peak
+
+        if pct <= rule.stop_pct:
+            reason = "🚨 LOSS"
+        elif pct >= rule.target_pct:
+            reason = "🎯 GAIN"
+        elif rule.trail_pct and peak > 0 and peak - pct >= rule.trail_pct:
+            reason = "📉 TRAIL"
+        else:
+            return
+
+        self._fired.add(con_id)
+        asyncio.ensure_future(self._act(record.with_mark(ticker.marketPrice()), rule, reason, pct))
+
+    async def _act(self, record, rule, reason, pct):
+        msg = (
+            f"{reason} **{record.symbol}** {record.local_symbol} hit {pct:.1f}% "
+            f"(Cost: {record.avg_cost:.2f} | Current: {record.mark_value:.2f})"
+        )
+        logger.info(msg)
+        if rule.auto_close:
+            try:
+                report = await flatten_all(self._ib, [record])
+                msg += f"\n{report.summary()}"
+            except Exception as e:
+                msg += f"\n❌ Auto-close failed: {e}"
+                self._fired.discard(record.con_id)
+        if self.alert is not None:
+            await self.alert(msg)
+
+
+exits = ExitEngine()
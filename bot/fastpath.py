@@ -0,0 +1,206 @@
+import os
+import re
+from datetime import datetime, date
+from dotenv import load_dotenv
+from bot.portfolio import portfolio
+
+load_dotenv()
+
+BUY_QUANTITY = 4
+SELL_QUANTITY = 1
+
+# Daytrade Contract: QQQ 6/23 525P Entry: 1.24
+CONTRACT_FIRST = re.compile(
+    r"\b(?P<symbol>[A-Z]{1,5})\s+(?P<expiry>\d{1,2}/\d{1,2}(?:/\d{2,4})?)\s+"
+    r"\$?(?P<strike>\d+(?:\.\d+)?)\s*(?P<right>[CP])(?:alls?|uts?)?\b",
+    re.IGNORECASE,
+)
+# Option: QQQ 525 P 6/23 ... Entry: 1.24  /  QQQ 525C 6/23
+STRIKE_FIRST = re.compile(
+    r"\b(?P<symbol>[A-Z]{1,5})\s+\$?(?P<strike>\d+(?:\.\d+)?)\s*(?P<right>[CP])(?:alls?|uts?)?\s+"
+    r"(?P<expiry>\d{1,2}/\d{1,2}(?:/\d{2,4})?)\b",
+    re.IGNORECASE,
+)
+SIZE = re.compile(r"\b(?:x|qty:?\s*)(?P<qty>\d+)\b|\b(?P<qty2>\d+)\s*(?:contracts?|cons?)\b", re.IGNORECASE)
+_SIZE_TAIL = r"(?P<size>\s+(?:x\s*\d+|qty:?\s*\d+|\d+\s*(?:contracts?|cons?)))?\s*$"
+_PRICE = r"\$?(?P<price>\d+(?:\.\d+)?)"
+
+# Entries only in the exact alert layouts, price required, nothing else on the message:
+#   Daytrade Contract: QQQ 6/23 525P Entry: 1.24
+#   Option: QQQ 525 P 6/23 Entry: 1.24
+#   BTO QQQ 6/23 525P @ 1.24
+LAYOUT_ENTRY = re.compile(
+    r"^\s*(?:(?:day\s*trade\s+)?contract|option)\s*:\s*(?P<body>.+?)\s+entry\s*:\s*" + _PRICE + _SIZE_TAIL,
+    re.IGNORECASE | re.DOTALL,
+)
+BTO_ENTRY = re.compile(r"^\s*bto\s+(?P<body>.+?)\s*(?:@|at)\s*" + _PRICE + _SIZE_TAIL, re.IGNORECASE | re.DOTALL)
+# Negated, conditional or recap wording is never certain enough to trade on
+HEDGED = re.compile(
+    r"\b(?:not|no|don'?t|won'?t|would|could|might|maybe|if|watching|watch|waiting|wait|yet|sold|stc)\b|%|->",
+    re.IGNORECASE,
+)
+
+CLOSE_ALL = re.compile(
+    r"\b(?:closed all|close all|out of the rest|all out|runners? left|sl (?:to|@) ?be|stop (?:to|@) ?be|last trim)\b",
+    re.IGNORECASE,
+)
+# Whatever number follows "trim": a size only when it is a bare integer,
+# "trim 525p" names a strike and "trimmed 1/3" a fraction
+TRIM = re.compile(r"\btrim(?:med|ming)?\b(?:\s+(?P<amount>\$?\d+(?:[./]\d+)?(?:\s?[CP]\b)?))?", re.IGNORECASE)
+# 525p / 525 C / 525.5c, but not "2 calls"
+STRIKE_MENTION = re.compile(r"(?<![\w./])\$?(?P<strike>\d+(?:\.\d+)?)\s?(?P<right>[CP])\b", re.IGNORECASE)
+RIGHT_WORD = re.compile(r"\b(?P<right>calls?|puts?)\b", re.IGNORECASE)
+TICKER_WORD = re.compile(r"(?P<dollar>\$)?\b(?P<word>[A-Za-z]{1,5})\b")
+# Lowercase words count as a ticker only when they are a symbol we know of
+KNOWN_SYMBOLS = {s.strip().upper() for s in os.getenv(
+    "FASTPATH_SYMBOLS",
+    "SPY,QQQ,SPX,IWM,DIA,TSLA,NVDA,AAPL,AMD,META,AMZN,MSFT,GOOGL,GOOG,NFLX,COIN,PLTR,AVGO,MU,SMCI",
+).split(",") if s.strip()}
+# All-caps words that show up in alerts without being tickers
+NOT_TICKERS = {
+    "SL", "BE", "TP", "PT", "PA", "BTO", "STC", "ATH", "EOD", "HOD", "LOD", "ITM", "OTM", "ATM",
+    "CALL", "CALLS", "PUT", "PUTS", "TRIM", "ALL", "OUT", "THE", "REST", "LAST", "STOP", "TO",
+    "AT", "FOR", "ME", "MY", "IM", "LOL", "IMO", "AND", "HERE", "SOME", "MORE", "UP", "DOWN",
+}
+
+
+class FastPathStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def report(self):
+        return f"⚡ Fast path: {self.hits} hits / {self.misses} misses ({self.hit_rate:.0%})"
+
+
+stats = FastPathStats()
+
+
+def normalize_expiry(text, today=None):
+    # 6/23 → YYYYMMDD, rolling to next year once the date has passed
+    today = today or date.today()
+    parts = [int(p) for p in text.split("/")]
+    month, day = parts[0], parts[1]
+    if len(parts) == 3:
+        year = parts[2] + 2000 if parts[2] < 100 else parts[2]
+    else:
+        year = today.year
+        if (month, day) < (today.month, today.day):
+            year += 1
+    return date(year, month, day).strftime("%Y%m%d")
+
+
+def _trade(symbol, right, expiry, strike, action, quantity, text):
+    return {
+        "symbol": symbol.upper(),
+        "contract_type": right.upper()[0],
+        "expiry": expiry,
+        "strike": float(strike),
+        "action": action,
+        "quantity": int(quantity),
+        "timestamp": datetime.utcnow().isoformat(),
+        "source": text,
+        "parser": "fastpath",
+    }
+
+
+def _entry(text):
+    if HEDGED.search(text):
+        return None
+    layout = LAYOUT_ENTRY.match(text) or BTO_ENTRY.match(text)
+    if not layout:
+        return None
+    body = layout.group("body").strip()
+    match = CONTRACT_FIRST.fullmatch(body) or STRIKE_FIRST.fullmatch(body)
+    if not match:
+        return None
+    size = SIZE.search(layout.group("size") or "")
+    quantity = int(size.group("qty") or size.group("qty2")) if size else BUY_QUANTITY
+    try:
+        expiry = normalize_expiry(match.group("expiry"))
+    except ValueError:
+        return None
+    return [_trade(match.group("symbol"), match.group("right"), expiry,
+                   match.group("strike"), "BUY", quantity, text)]
+
+
+def _named_symbols(text, held_symbols):
+    # $TSLA, an all-caps word, or any spelling of a held / well-known symbol
+    named = set()
+    for match in TICKER_WORD.finditer(text):
+        word = match.group("word")
+        upper = word.upper()
+        if match.group("dollar") or upper in held_symbols or upper in KNOWN_SYMBOLS:
+            named.add(upper)
+        elif word.isupper() and len(word) > 1 and upper not in NOT_TICKERS:
+            named.add(upper)
+    return named
+
+
+def _held_match(text, records):
+    # Narrow held positions by the named ticker and call/put word. A ticker we
+    # don't hold means the message is about something else: leave it to the LLM.
+    named = _named_symbols(text, {r.symbol for r in records})
+    if named:
+        records = [r for r in records if r.symbol in named]
+        if not records or named - {r.symbol for r in records}:
+            return None
+    right = RIGHT_WORD.search(text)
+    if right:
+        records = [r for r in records if r.right == right.group("right")[0].upper()]
+    elif not named and len(records) > 1:
+        return None
+    return records[0] if len(records) == 1 else None
+
+
+def _trim_quantity(amount, pos):
+    # None when the number can't be read as a size of this position
+    if amount is None or STRIKE_MENTION.fullmatch(amount):
+        return min(SELL_QUANTITY, pos.quantity)
+    if not amount.isdigit():
+        return None
+    quantity = int(amount)
+    if not 0 < quantity <= pos.quantity or quantity == pos.strike:
+        return None
+    return quantity
+
+
+def _exit(text):
+    close_all = CLOSE_ALL.search(text)
+    trim = TRIM.search(text)
+    if not close_all and not trim:
+        return None
+    if HEDGED.search(text.replace("%", "")):
+        return None
+    records = [r for r in portfolio.snapshot().records if r.quantity > 0 and r.sec_type == "OPT"]
+    if not records:
+        return None
+    pos = _held_match(text, records)
+    if pos is None:
+        return None
+    # A strike other than the held one means a different contract
+    for mention in STRIKE_MENTION.finditer(text):
+        if float(mention.group("strike")) != pos.strike or mention.group("right").upper() != pos.right:
+            return None
+    if close_all:
+        quantity = pos.quantity
+    else:
+        quantity = _trim_quantity(trim.group("amount"), pos)
+        if quantity is None:
+            return None
+    return [_trade(pos.symbol, pos.right, pos.expiry, pos.strike, "SELL", quantity, text)]
+
+
+def parse(text):
+    # Returns trade dicts for alert formats we recognise, None to defer to the LLM
+    trades = _entry(text) or _exit(text)
+    if trades:
+        stats.hits += 1
+        return trades
+    stats.misses += 1
+    return None
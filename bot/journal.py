@@ -0,0 +1,175 @@
+import os
+import asyncio
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from ib_insync import ExecutionFilter
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger('ibkr')
+
+JOURNAL_FILE = os.getenv("EXECUTION_JOURNAL", os.path.join("config", "executions.db"))
+# IB hands back at most this much execution history, older gaps can't be filled
+RESYNC_DAYS = int(os.getenv("JOURNAL_RESYNC_DAYS", 7))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS executions (
+    exec_id      TEXT PRIMARY KEY,
+    time         TEXT NOT NULL,
+    account      TEXT,
+    con_id       INTEGER,
+    symbol       TEXT,
+    local_symbol TEXT,
+    sec_type     TEXT,
+    side         TEXT,
+    shares       REAL,
+    price        REAL,
+    order_id     INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_exec_time ON executions(time);
+CREATE INDEX IF NOT EXISTS idx_exec_symbol_time ON executions(symbol, time);
+CREATE TABLE IF NOT EXISTS commissions (
+    exec_id      TEXT PRIMARY KEY,
+    commission   REAL,
+    currency     TEXT,
+    realized_pnl REAL
+);
+"""
+
+
+def _num(value):
+    return None if value is None or value != value or abs(value) > 1e300 else float(value)
+
+
+def _utc(ts):
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+class ExecutionJournal:
+    # Append-only execution + commission store. Syncs incrementally from a
+    # time cursor and records live fills as they are reported.
+    def __init__(self, path=JOURNAL_FILE):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        self._ib = None
+
+    def attach(self, ib):
+        if self._ib is ib:
+            return
+        self._ib = ib
+        ib.execDetailsEvent += self._on_exec
+        ib.commissionReportEvent += self._on_commission
+        # Catch up on anything that filled while the bot was down
+        asyncio.ensure_future(self.sync_async(ib))
+
+    @property
+    def attached(self):
+        return self._ib is not None and self._ib.isConnected()
+
+    def cursor(self):
+        # Newest journaled execution, or the oldest recent one still missing
+        # its commission row so the next sync fetches its realized PnL again
+        horizon = _utc(datetime.now(timezone.utc) - timedelta(days=RESYNC_DAYS))
+        with self._lock:
+            row = self._db.execute(
+                "SELECT MIN(e.time) FROM executions e LEFT JOIN commissions c USING (exec_id) "
+                "WHERE c.exec_id IS NULL AND e.time >= ?",
+                (horizon,),
+            ).fetchone()
+            if row[0] is None:
+                row = self._db.execute("SELECT MAX(time) FROM executions").fetchone()
+        return row[0]
+
+    def sync(self, ib):
+        # Only asks IB for executions since the cursor, see cursor()
+        since = self.cursor()
+        filt = ExecutionFilter(time=since.replace("-", "") + " UTC" if since else "")
+        fills = ib.reqExecutions(filt)
+        for fill in fills:
+            self.record(fill.contract, fill.execution, fill.commissionReport)
+        return len(fills)
+
+    async def sync_async(self, ib):
+        since = self.cursor()
+        filt = ExecutionFilter(time=since.replace("-", "") + " UTC" if since else "")
+        fills = await ib.reqExecutionsAsync(filt)
+        for fill in fills:
+            self.record(fill.contract, fill.execution, fill.commissionReport)
+        return len(fills)
+
+    def _on_exec(self, trade, fill):
+        self.record(fill.contract, fill.execution, None)
+
+    def _on_commission(self, trade, fill, report):
+        self.record(fill.contract, fill.execution, report)
+
+    def record(self, contract, execution, report=None):
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR IGNORE INTO executions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    execution.execId, _utc(execution.time), execution.acctNumber,
+                    contract.conId, contract.symbol, contract.localSymbol, contract.secType,
+                    execution.side, execution.shares, execution.price, execution.orderId,
+                ),
+            )
+            if report is not None and report.execId:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO commissions VALUES (?, ?, ?, ?)",
+                    (report.execId, _num(report.commission), report.currency, _num(report.realizedPNL)),
+                )
+
+    def fills(self, start=None, end=None, symbol=None, limit=None):
+        sql = (
+            "SELECT e.time, e.local_symbol, e.side, e.shares, e.price, c.realized_pnl "
+            "FROM executions e LEFT JOIN commissions c USING (exec_id) WHERE 1=1"
+        )
+        sql, args = self._where(sql, start, end, symbol)
+        sql += " ORDER BY e.time"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        with self._lock:
+            return self._db.execute(sql, args).fetchall()
+
+    def realized_pnl(self, start=None, end=None, symbol=None):
+        sql = (
+            "SELECT COALESCE(SUM(c.realized_pnl), 0), COALESCE(SUM(c.commission), 0) "
+            "FROM executions e JOIN commissions c USING (exec_id) WHERE 1=1"
+        )
+        sql, args = self._where(sql, start, end, symbol)
+        with self._lock:
+            realized, commission = self._db.execute(sql, args).fetchone()
+        return realized, commission
+
+    def _where(self, sql, start, end, symbol):
+        args = []
+        if start is not None:
+            sql += " AND e.time >= ?"
+            args.append(_utc(start))
+        if end is not None:
+            sql += " AND e.time < ?"
+            args.append(_utc(end))
+        if symbol:
+            sql += " AND e.symbol = ?"
+            args.append(symbol.upper())
+        return sql, args
+
+
+def day_start(day=None):
+    day = day or datetime.now().date()
+    return datetime(day.year, day.month, day.day).astimezone()
+
+
+def week_start(day=None):
+    day = day or datetime.now().date()
+    return day_start(day - timedelta(days=day.weekday()))
+
+
+journal = ExecutionJournal()
@@ -0,0 +1,89 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", 600))
+CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", 512))
+CACHE_DB = os.getenv("LLM_CACHE_DB", "")  # empty keeps the cache in memory only
+
+_SPACE = re.compile(r"\s+")
+_MENTION = re.compile(r"<[@#&!]+\d+>")
+
+
+def normalize(text):
+    # Reposts differ only in mentions, casing and whitespace
+    text = _MENTION.sub("", text or "")
+    return _SPACE.sub(" ", text).strip().lower()
+
+
+def cache_key(text, positions_summary):
+    fingerprint = hashlib.sha1((positions_summary or "").encode()).hexdigest()
+    return hashlib.sha256(f"{normalize(text)}\x00{fingerprint}".encode()).hexdigest()
+
+
+class DecisionCache:
+    # LLM result cache: bounded LRU in memory with TTL, optional SQLite tier.
+    def __init__(self, ttl=CACHE_TTL, max_size=CACHE_SIZE, path=CACHE_DB):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._db = None
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS decisions (key TEXT PRIMARY KEY, value TEXT, ts REAL)")
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[1] <= self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self._entries.pop(key, None)
+            if self._db is not None:
+                row = self._db.execute("SELECT value, ts FROM decisions WHERE key = ?", (key,)).fetchone()
+                if row and now - row[1] <= self.ttl:
+                    self._remember(key, row[0], row[1])
+                    self.disk_hits += 1
+                    return row[0]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            if self._db is not None:
+                with self._db:
+                    self._db.execute("INSERT OR REPLACE INTO decisions VALUES (?, ?, ?)", (key, value, now))
+                    self._db.execute("DELETE FROM decisions WHERE ts < ?", (now - self.ttl,))
+
+    def _remember(self, key, value, ts):
+        self._entries[key] = (value, ts)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def report(self):
+        total = self.hits + self.disk_hits + self.misses
+        rate = (self.hits + self.disk_hits) / total if total else 0.0
+        return (
+            f"🧠 LLM cache: {self.hits} hits, {self.disk_hits} disk hits, "
+            f"{self.misses} misses ({rate:.0%}), {len(self._entries)} entries"
+        )
+
+
+decisions = DecisionCache()
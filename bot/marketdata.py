@@ -0,0 +1,170 @@
+import os
+import math
+import asyncio
+import logging
+from collections import OrderedDict
+from datetime import datetime, timezone
+from ib_insync import Contract
+from eventkit import Event
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger('ibkr')
+
+# IB accounts get 100 concurrent market-data lines by default, keep headroom
+MAX_LINES = int(os.getenv("MKT_DATA_LINES", 90))
+QUOTE_TIMEOUT = float(os.getenv("QUOTE_TIMEOUT", 10))
+SNAPSHOT_TIMEOUT = float(os.getenv("SNAPSHOT_TIMEOUT", 3))
+# A bid/ask that has not ticked for this long is treated as no quote at all
+QUOTE_MAX_AGE = float(os.getenv("QUOTE_MAX_AGE", 30))
+
+
+def quote_age(ticker):
+    if ticker.time is None:
+        return 0.0
+    return (datetime.now(timezone.utc) - ticker.time).total_seconds()
+
+
+def has_quote(ticker, max_age=QUOTE_MAX_AGE):
+    bid, ask = ticker.bid, ticker.ask
+    return (
+        bid is not None and ask is not None and
+        not math.isnan(bid) and not math.isnan(ask) and
+        bid >= 0 and ask > 0 and
+        not (max_age and quote_age(ticker) > max_age)
+    )
+
+
+async def first_quote(ticker, timeout=QUOTE_TIMEOUT):
+    # Resolves on the first tick carrying a usable bid/ask, no polling
+    if has_quote(ticker):
+        return ticker
+
+    ready = asyncio.get_running_loop().create_future()
+
+    def on_update(t):
+        if has_quote(t) and not ready.done():
+            ready.set_result(t)
+
+    ticker.updateEvent += on_update
+    try:
+        return await asyncio.wait_for(ready, timeout)
+    except asyncio.TimeoutError:
+        return ticker
+    finally:
+        ticker.updateEvent -= on_update
+
+
+def _routable(contract):
+    # Positions come back without an exchange, market data needs one
+    if contract.exchange:
+        return contract
+    return Contract(conId=contract.conId, exchange="SMART")
+
+
+class MarketData:
+    # Standing ticker subscriptions for held and recently signalled contracts.
+    # Held contracts are pinned, everything else is evicted LRU once the line
+    # budget is used up.
+    def __init__(self, max_lines=MAX_LINES):
+        self.max_lines = max_lines
+        # Emitted after a reconnect replaced every Ticker object
+        self.resubscribedEvent = Event("resubscribed")
+        self._tickers = OrderedDict()
+        self._pinned = set()
+        self._ib = None
+
+    @property
+    def ib(self):
+        return self._ib
+
+    @property
+    def attached(self):
+        return self._ib is not None and self._ib.isConnected()
+
+    def attach(self, ib, held=()):
+        if self._ib is ib:
+            return
+        self._ib = ib
+        ib.positionEvent += self._on_position
+        ib.connectedEvent += self._on_reconnect
+        for contract in held:
+            self.subscribe(contract, pin=True)
+        logger.info(f"📡 Market data attached ({len(self._tickers)} lines)")
+
+    def _on_reconnect(self):
+        # ib_insync drops every ticker on disconnect, the old objects never
+        # tick again. Re-request each line and swap in the new tickers.
+        for con_id, ticker in list(self._tickers.items()):
+            self._tickers[con_id] = self._ib.reqMktData(_routable(ticker.contract), "", False, False)
+        logger.info(f"📡 Market data resubscribed after reconnect ({len(self._tickers)} lines)")
+        self.resubscribedEvent.emit()
+
+    def _on_position(self, pos):
+        if pos.position:
+            self.subscribe(pos.contract, pin=True)
+        else:
+            self._pinned.discard(pos.contract.conId)
+
+    def subscribe(self, contract, pin=False):
+        con_id = contract.conId
+        ticker = self._tickers.get(con_id)
+        if ticker is None:
+            ticker = self._ib.reqMktData(_routable(contract), "", False, False)
+            self._tickers[con_id] = ticker
+        self._tickers.move_to_end(con_id)
+        if pin:
+            self._pinned.add(con_id)
+        self._evict()
+        return ticker
+
+    def _evict(self):
+        excess = len(self._tickers) - self.max_lines
+        if excess <= 0:
+            return
+        for con_id in list(self._tickers):
+            if excess <= 0:
+                break
+            if con_id in self._pinned:
+                continue
+            ticker = self._tickers.pop(con_id)
+            self._ib.cancelMktData(ticker.contract)
+            excess -= 1
+        if excess > 0:
+            logger.warning(f"⚠️ {len(self._tickers)} market data lines pinned, above MKT_DATA_LINES={self.max_lines}")
+
+    def ticker(self, con_id):
+        return self._tickers.get(con_id)
+
+    async def wait_quote(self, contract, timeout=QUOTE_TIMEOUT):
+        # Returns the warm ticker right away, otherwise awaits its first valid tick
+        return await first_quote(self.subscribe(contract), timeout)
+
+    def stats(self):
+        return {"lines": len(self._tickers), "pinned": len(self._pinned), "max_lines": self.max_lines}
+
+
+market_data = MarketData()
+
+
+async def snapshot_quotes(ib, contracts, timeout=SNAPSHOT_TIMEOUT):
+    # conId -> ticker for the whole batch in a single wait. Warm tickers are
+    # reused when they live on this client, the rest go out as one reqTickers.
+    quotes = {}
+    missing = []
+    for contract in contracts:
+        ticker = market_data.ticker(contract.conId) if market_data.ib is ib else None
+        if ticker is not None and has_quote(ticker):
+            quotes[contract.conId] = ticker
+        else:
+            missing.append(_routable(contract))
+
+    if missing:
+        try:
+            tickers = await asyncio.wait_for(ib.reqTickersAsync(*missing), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ Snapshot quotes timed out after {timeout}s for {len(missing)} contracts")
+            tickers = []
+        for ticker in tickers:
+            quotes[ticker.contract.conId] = ticker
+    return quotes
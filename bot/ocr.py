@@ -1,9 +1,345 @@
+import os
+import time
+import asyncio
+import hashlib
+import threading
 from io import BytesIO
-from PIL import Image, ImageEnhance, ImageFilter
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dotenv import load_dotenv
+from PIL import Image, ImageChops, ImageOps
 import pytesseract
 
+try:
+    import tesserocr
+except ImportError:  # pytesseract (one subprocess per image) stays the fallback
+    tesserocr = None
+
+load_dotenv()
+
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", 2))
+OCR_QUEUE = int(os.getenv("OCR_QUEUE", 8))         # jobs waiting or running, beyond this we refuse
+OCR_TIMEOUT = float(os.getenv("OCR_TIMEOUT", 10))
+OCR_BACKEND = os.getenv("OCR_BACKEND", "auto")      # auto | tesserocr | pytesseract
+# Tesseract reads best around 20-40 px cap height; screenshots are far larger
+OCR_MAX_WIDTH = int(os.getenv("OCR_MAX_WIDTH", 1400))
+OCR_MIN_WIDTH = int(os.getenv("OCR_MIN_WIDTH", 700))
+# One uniform block of text. No character whitelist: the LSTM engine drops
+# every space when one is set, and the alert grammar needs them.
+OCR_CONFIG = os.getenv("OCR_CONFIG", "--oem 1 --psm 6 -c preserve_interword_spaces=1")
+OCR_CACHE_SIZE = int(os.getenv("OCR_CACHE_SIZE", 64))
+OCR_HASH_DISTANCE = int(os.getenv("OCR_HASH_DISTANCE", 4))      # of 64 bits
+OCR_NEAR_TOLERANCE = int(os.getenv("OCR_NEAR_TOLERANCE", 16))   # max grayscale step per grid cell, 0 = exact only
+
+
+def _ink_threshold(image, floor=0.0005):
+    # Background is the most common level and ink whatever sits far from it.
+    # A global Otsu split lands between Discord's sidebar and message pane,
+    # a few shades apart, and loses the text. Returns (threshold, dark theme).
+    histogram = image.histogram()
+    background = max(range(256), key=histogram.__getitem__)
+    dark = background < 128
+    levels = range(255, background, -1) if dark else range(0, background)
+    # The most extreme level with a real amount of ink, so stray pixels don't count
+    needed, seen, far = sum(histogram) * floor, 0, background
+    for level in levels:
+        seen += histogram[level]
+        if seen >= needed:
+            far = level
+            break
+    return (background + far) / 2, dark
+
+
+def preprocess(image):
+    # grayscale → text-sized scale → crop to the ink → black text on white
+    image = image.convert("L")
+    if image.width > OCR_MAX_WIDTH:
+        image = image.resize((OCR_MAX_WIDTH, round(image.height * OCR_MAX_WIDTH / image.width)), Image.LANCZOS)
+    elif image.width < OCR_MIN_WIDTH:
+        scale = OCR_MIN_WIDTH / image.width
+        image = image.resize((OCR_MIN_WIDTH, round(image.height * scale)), Image.BICUBIC)
+
+    # Dark themes (Discord) put light text on dark chrome, either way text ends up black
+    threshold, dark = _ink_threshold(image)
+    if dark:
+        binary = image.point(lambda v: 0 if v > threshold else 255)
+    else:
+        binary = image.point(lambda v: 0 if v < threshold else 255)
+
+    box = ImageOps.invert(binary).getbbox()
+    if box:
+        margin = 10
+        left, top, right, bottom = box
+        binary = binary.crop((max(left - margin, 0), max(top - margin, 0),
+                              min(right + margin, binary.width), min(bottom + margin, binary.height)))
+    # No median filter: at text size it eats thin strokes and fuses digits
+    return binary
+
+
+def _parse_config(config):
+    # "--oem 1 --psm 6 -c key=value ..." → (oem, psm, {key: value}) for tesserocr
+    parts = config.split()
+    oem, psm, variables = None, None, {}
+    for flag, value in zip(parts, parts[1:]):
+        if flag == "--oem":
+            oem = int(value)
+        elif flag == "--psm":
+            psm = int(value)
+        elif flag == "-c" and "=" in value:
+            key, _, val = value.partition("=")
+            variables[key] = val
+    return oem, psm, variables
+
+
+class PytesseractBackend:
+    # Shells out to the tesseract binary, which reloads its model every image
+    name = "pytesseract"
+
+    def __init__(self, config=OCR_CONFIG):
+        self.config = config
+
+    def image_to_string(self, image):
+        return pytesseract.image_to_string(image, config=self.config)
+
+    def version(self):
+        return str(pytesseract.get_tesseract_version())
+
+
+class TesserocrBackend:
+    # libtesseract in-process: the model is loaded once and reused per worker
+    name = "tesserocr"
+
+    def __init__(self, config=OCR_CONFIG):
+        if tesserocr is None:
+            raise RuntimeError("tesserocr is not installed")
+        oem, psm, variables = _parse_config(config)
+        # OEM/PSM are plain int constants in tesserocr, the values pass straight through
+        kwargs = {}
+        if oem is not None:
+            kwargs["oem"] = oem
+        if psm is not None:
+            kwargs["psm"] = psm
+        self.api = tesserocr.PyTessBaseAPI(**kwargs)
+        for key, value in variables.items():
+            self.api.SetVariable(key, value)
+
+    def image_to_string(self, image):
+        self.api.SetImage(image)
+        return self.api.GetUTF8Text()
+
+    def version(self):
+        return tesserocr.tesseract_version().splitlines()[0]
+
+
+BACKENDS = {"tesserocr": TesserocrBackend, "pytesseract": PytesseractBackend}
+_backend = None
+
+
+def make_backend(name=OCR_BACKEND):
+    if name == "auto":
+        name = "tesserocr" if tesserocr is not None else "pytesseract"
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown OCR backend: {name}")
+    try:
+        return BACKENDS[name]()
+    except Exception as e:
+        if name == "pytesseract":
+            raise
+        print(f"[!] OCR backend {name} unavailable ({e}), using pytesseract")
+        return PytesseractBackend()
+
+
+def get_backend():
+    # One engine per process, created on first use (or by the pool initializer)
+    global _backend
+    if _backend is None:
+        _backend = make_backend()
+    return _backend
+
+
+def _init_worker(name):
+    global _backend
+    _backend = make_backend(name)
+
+
 def ocr_from_screenshot(screenshot_bytes):
-    image = Image.open(BytesIO(screenshot_bytes)).convert("L")
-    image = image.filter(ImageFilter.SHARPEN)
-    image = ImageEnhance.Contrast(image).enhance(2.0)
-    return pytesseract.image_to_string(image)
+    image = preprocess(Image.open(BytesIO(screenshot_bytes)))
+    return get_backend().image_to_string(image)
+
+
+def fingerprint(screenshot_bytes, width=512):
+    # A 64-bit difference hash to find candidates quickly, plus a small
+    # grayscale grid to confirm them. The hash alone cannot tell 525P from
+    # 530P, the grid can.
+    image = Image.open(BytesIO(screenshot_bytes))
+    image.draft("L", (width * 2, width * 2))  # JPEG decodes at reduced size, others ignore it
+    image = image.convert("L")
+    grid = image.resize((width, max(1, round(width * image.height / image.width))), Image.BOX)
+    pixels = list(grid.resize((9, 8), Image.BILINEAR).tobytes())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return bits, grid
+
+
+class OCRCache:
+    # Recent OCR results, keyed by exact bytes and matched by perceptual
+    # fingerprint, so a reposted or recompressed screenshot costs nothing.
+    # Rescaled copies are deliberately not matched: resampling noise is as
+    # large as a one-digit change in a strike.
+    def __init__(self, max_size=OCR_CACHE_SIZE, distance=OCR_HASH_DISTANCE, tolerance=OCR_NEAR_TOLERANCE):
+        self.max_size = max_size
+        self.distance = distance
+        self.tolerance = tolerance
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def digest(screenshot_bytes):
+        return hashlib.sha1(screenshot_bytes).hexdigest()
+
+    def get_exact(self, digest):
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return entry[2]
+
+    def get_near(self, phash, grid):
+        with self._lock:
+            candidates = [
+                (digest, entry) for digest, entry in self._entries.items()
+                if bin(entry[0] ^ phash).count("1") <= self.distance and entry[1].size == grid.size
+            ]
+        for digest, (_, known, text) in candidates:
+            if ImageChops.difference(known, grid).getextrema()[1] <= self.tolerance:
+                with self._lock:
+                    if digest in self._entries:
+                        self._entries.move_to_end(digest)
+                    self.near_hits += 1
+                return text
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, digest, phash, grid, text):
+        with self._lock:
+            self._entries[digest] = (phash, grid, text)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def report(self):
+        return f"{self.hits} exact + {self.near_hits} near-duplicate cache hits, {self.misses} misses"
+
+
+def warm_up():
+    # First call pays for starting the engine, do it before an alert does
+    backend = get_backend()
+    return f"{backend.name} {backend.version()}"
+
+
+def _timed_ocr(screenshot_bytes):
+    # Runs in a worker process, reports its own compute time next to the text
+    begin = time.perf_counter()
+    text = ocr_from_screenshot(screenshot_bytes)
+    return text, time.perf_counter() - begin
+
+
+class OCRPool:
+    # Bounded process pool for screenshots: the event loop only awaits the
+    # result, PIL and tesseract never run on it.
+    def __init__(self, workers=OCR_WORKERS, max_queue=OCR_QUEUE, timeout=OCR_TIMEOUT, backend=OCR_BACKEND):
+        self.workers = workers
+        self.backend = backend
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._executor = None
+        self._lock = threading.Lock()
+        self.cache = OCRCache()
+        self.depth = 0
+        self.completed = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.total_ocr = 0.0
+        self.total_wait = 0.0
+        self.max_ocr = 0.0
+
+    @property
+    def executor(self):
+        # Started lazily so importing bot.ocr never forks
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, initializer=_init_worker, initargs=(self.backend,)
+                )
+            return self._executor
+
+    def warm_up(self):
+        # Spawns a worker and has it locate tesseract
+        return asyncio.get_running_loop().run_in_executor(self.executor, warm_up)
+
+    async def run(self, screenshot_bytes, timeout=None):
+        digest = self.cache.digest(screenshot_bytes)
+        text = self.cache.get_exact(digest)
+        if text is not None:
+            return text
+        # Hashing decodes the image, keep that off the loop as well
+        phash, grid = await asyncio.get_running_loop().run_in_executor(None, fingerprint, screenshot_bytes)
+        text = self.cache.get_near(phash, grid)
+        if text is not None:
+            return text
+        text = await self._ocr(screenshot_bytes, timeout)
+        self.cache.put(digest, phash, grid, text)
+        return text
+
+    async def _ocr(self, screenshot_bytes, timeout=None):
+        if self.depth >= self.max_queue:
+            self.rejected += 1
+            raise RuntimeError(f"OCR queue full ({self.depth} jobs)")
+        loop = asyncio.get_running_loop()
+        begin = time.perf_counter()
+        job = self.executor.submit(_timed_ocr, screenshot_bytes)
+        self.depth += 1
+        # depth counts jobs the pool still holds: a timed-out job that already
+        # started keeps its worker until it finishes, so it is released then
+        job.add_done_callback(lambda _: loop.call_soon_threadsafe(self._release))
+        try:
+            # A cancelled or timed-out job that has not started yet never runs;
+            # one already in a worker finishes there and is discarded.
+            text, seconds = await asyncio.wait_for(asyncio.wrap_future(job), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise TimeoutError(f"OCR took longer than {timeout or self.timeout:g}s")
+        self.completed += 1
+        self.total_ocr += seconds
+        self.total_wait += time.perf_counter() - begin - seconds
+        self.max_ocr = max(self.max_ocr, seconds)
+        return text
+
+    def _release(self):
+        self.depth -= 1
+
+    def report(self):
+        done = self.completed or 1
+        return (
+            f"🖼 OCR ({self.backend}): {self.depth} in flight, {self.completed} done, {self.timeouts} timed out, "
+            f"{self.rejected} rejected | avg {self.total_ocr / done * 1000:.0f} ms "
+            f"(max {self.max_ocr * 1000:.0f} ms), avg queue wait {self.total_wait / done * 1000:.0f} ms\n"
+            f"🖼 OCR cache: {self.cache.report()}"
+        )
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+ocr_pool = OCRPool()
@@ -0,0 +1,101 @@
+import os
+import sys
+import glob
+import time
+import statistics
+from io import BytesIO
+from PIL import Image, ImageDraw, ImageFont
+from bot.ocr import BACKENDS, preprocess
+
+# python -m bot.ocrbench [screenshot_dir] [runs]
+# Without a directory, a set of alert-style screenshots is rendered locally.
+
+SAMPLE_ALERTS = [
+    "Daytrade Contract: QQQ 6/23 525P Entry: 1.24",
+    "Option: SPY 560 C 7/3 Entry: 2.10",
+    "trim qqq calls here, 50% up",
+    "TSLA 8/15 250C @ 3.45 x2",
+    "closed all, runners left on NVDA",
+    "bad PA on spy today, watching 555 support",
+]
+
+
+def render_samples():
+    # Discord-like dark theme, sidebar chrome, alert text in the message pane
+    try:
+        font = ImageFont.load_default(size=28)
+    except TypeError:
+        font = ImageFont.load_default()
+    samples = []
+    for i, text in enumerate(SAMPLE_ALERTS):
+        image = Image.new("RGB", (2400, 1400), (49, 51, 56))
+        draw = ImageDraw.Draw(image)
+        draw.rectangle((0, 0, 240, 1400), fill=(30, 31, 34))
+        draw.text((24, 24), "# alerts", fill=(200, 200, 200), font=font)
+        draw.text((300, 460), "bear-ideas  Today at 9:4{}".format(i), fill=(160, 160, 160), font=font)
+        draw.text((300, 510), text, fill=(220, 220, 220), font=font)
+        buffer = BytesIO()
+        image.save(buffer, "PNG")
+        samples.append((f"sample-{i}.png", buffer.getvalue()))
+    return samples
+
+
+def load_samples(directory):
+    paths = sorted(glob.glob(os.path.join(directory, "*.png")) + glob.glob(os.path.join(directory, "*.jp*g")))
+    samples = []
+    for path in paths:
+        with open(path, "rb") as f:
+            samples.append((os.path.basename(path), f.read()))
+    return samples
+
+
+def bench(backend_cls, samples, runs):
+    begin = time.perf_counter()
+    backend = backend_cls()
+    startup = time.perf_counter() - begin
+    images = [(name, preprocess(Image.open(BytesIO(data)))) for name, data in samples]
+    timings, outputs = [], {}
+    for _ in range(runs):
+        for name, image in images:
+            begin = time.perf_counter()
+            outputs[name] = backend.image_to_string(image).strip()
+            timings.append(time.perf_counter() - begin)
+    return startup, timings, outputs
+
+
+def main(argv):
+    directory = argv[1] if len(argv) > 1 else None
+    runs = int(argv[2]) if len(argv) > 2 else 3
+    samples = load_samples(directory) if directory else render_samples()
+    if not samples:
+        print(f"No screenshots in {directory}")
+        return
+
+    results = {}
+    for name, backend_cls in BACKENDS.items():
+        try:
+            results[name] = bench(backend_cls, samples, runs)
+        except Exception as e:
+            print(f"{name:12} unavailable: {e}")
+
+    print(f"{len(samples)} screenshots x {runs} runs")
+    for name, (startup, timings, _) in results.items():
+        ordered = sorted(timings)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        print(
+            f"{name:12} init {startup * 1000:7.1f} ms | per image mean {statistics.mean(timings) * 1000:7.1f} ms, "
+            f"p50 {statistics.median(timings) * 1000:7.1f} ms, p95 {p95 * 1000:7.1f} ms"
+        )
+
+    if len(results) > 1:
+        names = list(results)
+        first, second = results[names[0]][2], results[names[1]][2]
+        same = sum(first[k] == second.get(k) for k in first)
+        print(f"Identical text from {names[0]} and {names[1]}: {same}/{len(first)}")
+        for key in first:
+            if first[key] != second.get(key):
+                print(f"  {key}: {first[key]!r} vs {second.get(key)!r}")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,220 @@
+import os
+import time
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import List
+from ib_insync import Contract, LimitOrder, MarketOrder
+from dotenv import load_dotenv
+from bot.contracts import contracts
+from bot.marketdata import has_quote, snapshot_quotes, SNAPSHOT_TIMEOUT
+
+load_dotenv()
+logger = logging.getLogger('ibkr')
+
+CANCEL_DEADLINE = float(os.getenv("CANCEL_DEADLINE", 5))
+USE_GLOBAL_CANCEL = os.getenv("CANCEL_USE_GLOBAL", "false").lower() == "true"
+FLATTEN_LIMIT_WAIT = float(os.getenv("FLATTEN_LIMIT_WAIT", 2))
+# Overall bound on flatten_all, every stage below draws from it
+FLATTEN_DEADLINE = float(os.getenv("FLATTEN_DEADLINE", 10))
+DONE_STATES = ("Filled", "Cancelled", "ApiCancelled", "Inactive")
+
+
+@dataclass
+class CancelReport:
+    cancelled: List[int] = field(default_factory=list)
+    partially_filled: List[int] = field(default_factory=list)   # rest cancelled after a partial fill
+    filled: List[int] = field(default_factory=list)             # fully filled before the cancel landed
+    failed: List[int] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    def summary(self):
+        total = len(self.cancelled) + len(self.partially_filled) + len(self.filled) + len(self.failed)
+        if not total:
+            return "📭 No eligible pending orders to cancel"
+        lines = [f"❌ Cancelled {len(self.cancelled) + len(self.partially_filled)}/{total} orders in {self.elapsed:.2f}s"]
+        if self.partially_filled:
+            lines.append(f"⚠️ Partially filled before cancel: {', '.join(map(str, self.partially_filled))}")
+        if self.filled:
+            lines.append(f"⚠️ Filled before cancel: {', '.join(map(str, self.filled))}")
+        if self.failed:
+            lines.append(f"❗ Still working: {', '.join(map(str, self.failed))}")
+        return "\n".join(lines)
+
+
+def _matches(trade, symbol, side, con_ids=None):
+    if con_ids is not None and trade.contract.conId not in con_ids:
+        return False
+    if symbol and trade.contract.symbol.upper() != symbol.upper():
+        return False
+    if side and trade.order.action.upper() != side.upper():
+        return False
+    return True
+
+
+async def wait_done(trades, timeout):
+    # Resolves once every trade reaches a final state or the deadline passes
+    loop = asyncio.get_running_loop()
+    pending = {}
+    for trade in trades:
+        if trade.orderStatus.status in DONE_STATES:
+            continue
+        future = loop.create_future()
+
+        def on_status(t, future=future):
+            if t.orderStatus.status in DONE_STATES and not future.done():
+                future.set_result(t)
+
+        trade.statusEvent += on_status
+        pending[trade] = (future, on_status)
+
+    try:
+        if pending:
+            await asyncio.wait([f for f, _ in pending.values()], timeout=timeout)
+    finally:
+        for trade, (_, handler) in pending.items():
+            trade.statusEvent -= handler
+
+
+async def cancel_orders(ib, symbol=None, side=None, deadline=CANCEL_DEADLINE, use_global=USE_GLOBAL_CANCEL,
+                        con_ids=None):
+    start = time.monotonic()
+    await ib.reqAllOpenOrdersAsync()
+    trades = [t for t in ib.openTrades() if t.orderStatus.status not in DONE_STATES and _matches(t, symbol, side, con_ids)]
+
+    if use_global and not symbol and not side and con_ids is None:
+        ib.reqGlobalCancel()
+        logger.info(f"🔁 Sent global cancel for {len(trades)} orders")
+    else:
+        # Fire every cancel before waiting on any of them
+        for trade in trades:
+            ib.cancelOrder(trade.order)
+        logger.info(f"🔁 Sent {len(trades)} cancel requests")
+
+    await wait_done(trades, deadline)
+
+    report = CancelReport()
+    for trade in trades:
+        order_id = trade.order.orderId
+        status = trade.orderStatus.status
+        if status not in DONE_STATES:
+            report.failed.append(order_id)
+        elif status == "Filled":
+            report.filled.append(order_id)
+        elif trade.orderStatus.filled > 0:
+            report.partially_filled.append(order_id)
+        else:
+            report.cancelled.append(order_id)
+    report.elapsed = time.monotonic() - start
+    logger.info(report.summary())
+    return report
+
+
+@dataclass
+class FlattenReport:
+    closed: List[str] = field(default_factory=list)
+    unfilled: List[str] = field(default_factory=list)
+    realized_pnl: float = 0.0
+    elapsed: float = 0.0
+
+    def summary(self):
+        lines = list(self.closed)
+        if self.unfilled:
+            lines.append(f"❗ Not flat: {', '.join(self.unfilled)}")
+        lines.append(f"⏱️ Flattened in {self.elapsed:.2f}s")
+        return "\n".join(lines)
+
+
+def _closing_contract(record):
+    if record.sec_type == "OPT":
+        cached = contracts.lookup(record.symbol, record.expiry, record.strike, record.right)
+        if cached is not None:
+            return cached
+    return Contract(conId=record.con_id, exchange="SMART")
+
+
+def _fill_pnl(record, trade):
+    # Prefer IB's own realized PnL per fill, fall back to fill price vs avg cost
+    pnl = 0.0
+    sign = 1 if record.quantity > 0 else -1
+    for fill in trade.fills:
+        report = fill.commissionReport
+        if report and report.realizedPNL and abs(report.realizedPNL) < 1e300:
+            pnl += report.realizedPNL
+        else:
+            pnl += (fill.execution.price * record.multiplier - record.avg_cost) * fill.execution.shares * sign
+    return pnl
+
+
+async def flatten_all(ib, records, limit_wait=FLATTEN_LIMIT_WAIT, deadline=FLATTEN_DEADLINE):
+    start = time.monotonic()
+    records = [r for r in records if r.quantity]
+    report = FlattenReport()
+    if not records:
+        return report
+
+    def left(cap):
+        return min(cap, max(deadline - (time.monotonic() - start), 0))
+
+    # Resting bracket exits and chased orders would otherwise still trigger
+    # after we are flat and open a naked short
+    resting = await cancel_orders(ib, con_ids={r.con_id for r in records}, deadline=left(CANCEL_DEADLINE))
+    if resting.failed:
+        logger.warning(f"⚠️ Orders still working before flatten: {resting.failed}")
+
+    accounts = ib.managedAccounts()
+    closing = [(r, _closing_contract(r)) for r in records]
+    quotes = await snapshot_quotes(ib, [c for _, c in closing], timeout=left(SNAPSHOT_TIMEOUT))
+
+    # Marketable limits at the far touch, all sent before waiting on any
+    legs = []
+    for record, contract in closing:
+        action = "SELL" if record.quantity > 0 else "BUY"
+        quantity = abs(record.quantity)
+        ticker = quotes.get(contract.conId)
+        if ticker is not None and has_quote(ticker):
+            order = LimitOrder(action, quantity, ticker.bid if action == "SELL" else ticker.ask)
+        else:
+            order = MarketOrder(action, quantity)
+        order.outsideRth = True
+        if accounts:
+            order.account = accounts[0]
+        legs.append([record, contract, ib.placeOrder(contract, order)])
+
+    await wait_done([t for _, _, t in legs], left(limit_wait))
+
+    # Whatever is still resting goes out at market for the remaining size, but
+    # only once its cancel is confirmed: a limit that fills after the market
+    # order would sell the position twice
+    stragglers = [leg for leg in legs if leg[2].orderStatus.status not in DONE_STATES]
+    for _, _, trade in stragglers:
+        ib.cancelOrder(trade.order)
+    await wait_done([t for _, _, t in stragglers], left(CANCEL_DEADLINE))
+    for leg in stragglers:
+        record, contract, trade = leg
+        if trade.orderStatus.status not in DONE_STATES:
+            logger.warning(f"⚠️ {record.local_symbol} limit cancel not confirmed, no MARKET sent")
+            continue
+        remaining = trade.orderStatus.remaining
+        if remaining > 0:
+            logger.warning(f"⚠️ {record.local_symbol} limit not filled, sending MARKET for {remaining}")
+            order = MarketOrder(trade.order.action, remaining)
+            order.outsideRth = True
+            order.account = trade.order.account
+            leg.append(ib.placeOrder(contract, order))
+
+    await wait_done([leg[-1] for leg in legs], left(deadline))
+
+    for record, contract, *trades in legs:
+        pnl = sum(_fill_pnl(record, t) for t in trades)
+        filled = sum(t.orderStatus.filled for t in trades)
+        report.realized_pnl += pnl
+        if filled >= abs(record.quantity):
+            avg = sum(f.execution.price * f.execution.shares for t in trades for f in t.fills) / max(filled, 1)
+            report.closed.append(f"✅ Closed {filled:g} {record.local_symbol} at {avg:.2f}, PnL: {pnl:.2f}")
+        else:
+            working = " limit still working" if trades[-1].orderStatus.status not in DONE_STATES else ""
+            report.unfilled.append(f"{record.local_symbol} ({filled:g}/{abs(record.quantity):g}{working})")
+    report.elapsed = time.monotonic() - start
+    logger.info(report.summary())
+    return report
@@ -1,53 +1,48 @@
-from datetime import datetime
 from llmopenai import LLM
-import json
+from bot import fastpath
+from bot.triage import triage
+from bot.signals import parse_signals
 
 llm = LLM()
 
-def parse_message(text):
+def parse_locally(text):
+    # Everything that resolves without an LLM round trip: a known alert format,
+    # a decision already made against the current positions, or confident noise.
+    # None means the message still needs the LLM.
+    trades = fastpath.parse(text)
+    if trades is not None:
+        print(f"[⚡] Fast path: {trades}")
+        return trades
+    cached = llm.cached(text)
+    if cached is not None:
+        return to_trades(text, parse_signals(cached))
+    if triage.skip(text):
+        return []
+    return None
+
+
+def to_trades(text, signals):
+    trades = [signal.to_trade(text) for signal in signals if signal.actionable]
+    if not trades:
+        print(f"[!] No actionable trade in: {signals}")
+    return trades
+
+
+async def extract_messages_async(texts):
+    # Messages parse_locally could not resolve, all in one LLM call. Only fresh
+    # LLM answers train triage: cache hits never get here.
     try:
-        response = llm.prompt(text)
+        try:
+            batches = await llm.aextract_batch(texts)
+        except Exception as e:
+            print(f"[x] LLM parsing error: {e}")
+            batches = [[] for _ in texts]
+        results = []
+        for text, signals in zip(texts, batches):
+            triage.observe(text, signals)
+            results.append(to_trades(text, signals))
+        return results
+    finally:
+        for text in texts:
+            triage.forget(text)
 
-        # Parse JSON string from LLM into dict
-        trade = dict(
-            (k.strip(), v.strip()) for k, v in
-            (field.split(":", 1) for field in response.split(", ") if ":" in field)
-        )
-
-        # Required fields
-        required = ["symbol", "contract_type", "expiry", "strike", "action", "quantity"]
-        if not all(field in trade for field in required):
-            print(f"[!] Missing fields in trade: {trade}")
-            return []
-
-        # Normalize with stripping
-        trade["symbol"] = trade["symbol"].strip().upper()
-        trade["contract_type"] = trade["contract_type"].strip().upper()[0]  # safer: could add check
-        trade["expiry"] = trade["expiry"].strip()
-        trade["strike"] = float(trade["strike"].strip())
-        trade["quantity"] = int(trade["quantity"].strip())
-        trade["action"] = trade["action"].strip().upper()
-
-        # Validate contract_type
-        if trade["contract_type"] not in {"C", "P"}:
-            print(f"[!] Invalid contract_type: {trade['contract_type']}")
-            return []
-
-        # Validate expiry (simple YYYYMMDD check)
-        if not (trade["expiry"].isdigit() and len(trade["expiry"]) == 8):
-            print(f"[!] Invalid expiry: {trade['expiry']}")
-            return []
-        expiry_date = trade["expiry"]
-        if expiry_date.startswith("2024"):
-            # Replace 2024 with 2025 while keeping month/day the same
-            corrected_expiry = "2025" + expiry_date[4:]
-            trade["expiry"] = corrected_expiry
-
-        # Add timestamp + source
-        trade["timestamp"] = datetime.utcnow().isoformat()
-        trade["source"] = text
-
-        return [trade]
-    except Exception as e:
-        print(f"[x] LLM parsing error: {e}")
-        return []
\ No newline at end of file
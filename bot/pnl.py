@@ -0,0 +1,141 @@
+import math
+import time
+import logging
+from dataclasses import dataclass, field
+from typing import Dict
+from eventkit import Event
+
+logger = logging.getLogger('ibkr')
+
+
+def _num(value):
+    return 0.0 if value is None or math.isnan(value) or abs(value) > 1e300 else float(value)
+
+
+@dataclass(frozen=True)
+class ContractPnL:
+    con_id: int
+    daily: float
+    unrealized: float
+    realized: float
+    position: float
+    value: float
+
+
+@dataclass(frozen=True)
+class PnLState:
+    daily: float = 0.0
+    unrealized: float = 0.0
+    realized: float = 0.0
+    contracts: Dict[int, ContractPnL] = field(default_factory=dict)
+    updated: float = 0.0
+
+    @property
+    def age(self):
+        return time.time() - self.updated if self.updated else float("inf")
+
+
+class PnLService:
+    # Live account and per-contract PnL from reqPnL / reqPnLSingle. Every
+    # change is published on changeEvent(state).
+    def __init__(self):
+        self.changeEvent = Event("pnlChange")
+        self._ib = None
+        self._account = None
+        self._singles = {}
+        self._state = PnLState()
+
+    @property
+    def ready(self):
+        return self._ib is not None and self._ib.isConnected() and self._state.updated > 0
+
+    @property
+    def state(self) -> PnLState:
+        return self._state
+
+    def attach(self, ib, held=(), account=None):
+        if self._ib is ib:
+            return
+        accounts = ib.managedAccounts()
+        self._account = account or (accounts[0] if accounts else "")
+        self._ib = ib
+        ib.pnlEvent += self._on_pnl
+        ib.pnlSingleEvent += self._on_single
+        ib.positionEvent += self._on_position
+        ib.connectedEvent += self._on_reconnect
+        ib.reqPnL(self._account)
+        for con_id in held:
+            self._subscribe(con_id)
+        logger.info(f"💹 PnL stream attached for {self._account} ({len(self._singles)} contracts)")
+
+    def _on_reconnect(self):
+        # Subscriptions die with the connection: re-issue them, and stop
+        # reporting the old numbers until fresh ones arrive
+        self._state = PnLState()
+        held = list(self._singles)
+        self._singles = {}
+        self._ib.reqPnL(self._account)
+        for con_id in held:
+            self._subscribe(con_id)
+        logger.info(f"💹 PnL stream resubscribed after reconnect ({len(self._singles)} contracts)")
+
+    def _subscribe(self, con_id):
+        if con_id not in self._singles:
+            self._singles[con_id] = self._ib.reqPnLSingle(self._account, "", con_id)
+
+    def _unsubscribe(self, con_id):
+        if self._singles.pop(con_id, None) is not None:
+            self._ib.cancelPnLSingle(self._account, "", con_id)
+
+    def _on_position(self, pos):
+        if pos.account != self._account:
+            return
+        if pos.position:
+            self._subscribe(pos.contract.conId)
+        else:
+            self._unsubscribe(pos.contract.conId)
+
+    def _on_pnl(self, pnl):
+        if pnl.account != self._account:
+            return
+        self._publish(
+            daily=_num(pnl.dailyPnL),
+            unrealized=_num(pnl.unrealizedPnL),
+            realized=_num(pnl.realizedPnL),
+        )
+
+    def _on_single(self, single):
+        if single.account != self._account:
+            return
+        contracts = dict(self._state.contracts)
+        contracts[single.conId] = ContractPnL(
+            con_id=single.conId,
+            daily=_num(single.dailyPnL),
+            unrealized=_num(single.unrealizedPnL),
+            realized=_num(single.realizedPnL),
+            position=_num(single.position),
+            value=_num(single.value),
+        )
+        self._publish(contracts=contracts)
+
+    def _publish(self, **changes):
+        current = self._state
+        self._state = PnLState(
+            daily=changes.get("daily", current.daily),
+            unrealized=changes.get("unrealized", current.unrealized),
+            realized=changes.get("realized", current.realized),
+            contracts=changes.get("contracts", current.contracts),
+            updated=time.time(),
+        )
+        self.changeEvent.emit(self._state)
+
+    def report(self):
+        s = self._state
+        return (
+            f"📊 Unrealized PnL: {s.unrealized:.2f} USD\n"
+            f"💵 Realized PnL: {s.realized:.2f} USD\n"
+            f"📅 Daily PnL: {s.daily:.2f} USD ({s.age:.1f}s old)"
+        )
+
+
+pnl = PnLService()
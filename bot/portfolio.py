@@ -0,0 +1,191 @@
+import time
+import logging
+import threading
+from dataclasses import dataclass, replace
+from typing import Dict, Optional, Tuple
+from bot.session import get_ib
+
+logger = logging.getLogger('ibkr')
+
+
+@dataclass(frozen=True)
+class PositionRecord:
+    con_id: int
+    contract: object
+    symbol: str
+    local_symbol: str
+    sec_type: str
+    right: str
+    strike: float
+    expiry: str
+    multiplier: float
+    quantity: float
+    avg_cost: float        # per contract, already includes the multiplier (IB averageCost)
+    mark: float            # per share/unit (IB marketPrice)
+    market_value: float
+    unrealized_pnl: float
+    realized_pnl: float
+    updated: float
+
+    @property
+    def mark_value(self):
+        # Mark expressed in the same units as avg_cost
+        return self.mark * self.multiplier
+
+    def with_mark(self, mark):
+        if mark is None or mark != mark:
+            return self
+        return replace(self, mark=float(mark),
+                       unrealized_pnl=(float(mark) * self.multiplier - self.avg_cost) * self.quantity)
+
+    @property
+    def pnl_pct(self):
+        if not self.avg_cost or self.mark != self.mark:
+            return None
+        return (self.mark_value - self.avg_cost) / self.avg_cost * 100
+
+
+@dataclass(frozen=True)
+class PortfolioSnapshot:
+    version: int
+    updated: float
+    records: Tuple[PositionRecord, ...]
+
+    @property
+    def age(self):
+        return time.time() - self.updated if self.updated else float("inf")
+
+
+def _multiplier(contract):
+    try:
+        return float(contract.multiplier or 1)
+    except (TypeError, ValueError):
+        return 1.0
+
+
+def _record(contract, quantity, avg_cost, mark=float("nan"), market_value=0.0,
+            unrealized_pnl=0.0, realized_pnl=0.0):
+    return PositionRecord(
+        con_id=contract.conId,
+        contract=contract,
+        symbol=contract.symbol,
+        local_symbol=contract.localSymbol,
+        sec_type=contract.secType,
+        right=(contract.right or "")[:1].upper(),
+        strike=float(contract.strike or 0),
+        expiry=contract.lastTradeDateOrContractMonth,
+        multiplier=_multiplier(contract),
+        quantity=float(quantity),
+        avg_cost=float(avg_cost),
+        mark=float(mark),
+        market_value=float(market_value),
+        unrealized_pnl=float(unrealized_pnl),
+        realized_pnl=float(realized_pnl),
+        updated=time.time(),
+    )
+
+
+class PortfolioStore:
+    # In-process view of IB positions kept current by push events, so readers
+    # never need a round trip to the gateway.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._records: Dict[int, PositionRecord] = {}
+        self._version = 0
+        self._updated = 0.0
+        self._ib = None
+
+    @property
+    def attached(self):
+        return self._ib is not None and self._ib.isConnected()
+
+    def attach(self, ib):
+        if self._ib is ib:
+            return
+        if self._ib is not None:
+            self.detach()
+        self._ib = ib
+        ib.updatePortfolioEvent += self._on_portfolio
+        ib.positionEvent += self._on_position
+        self.seed(ib)
+        logger.info(f"📦 Portfolio store attached ({len(self._records)} positions)")
+
+    def detach(self):
+        if self._ib is None:
+            return
+        self._ib.updatePortfolioEvent -= self._on_portfolio
+        self._ib.positionEvent -= self._on_position
+        self._ib = None
+
+    def seed(self, ib):
+        records = {}
+        for item in ib.portfolio():
+            if item.position:
+                records[item.contract.conId] = _record(
+                    item.contract, item.position, item.averageCost, item.marketPrice,
+                    item.marketValue, item.unrealizedPNL, item.realizedPNL)
+        for pos in ib.positions():
+            if pos.position and pos.contract.conId not in records:
+                records[pos.contract.conId] = _record(pos.contract, pos.position, pos.avgCost)
+        with self._lock:
+            self._records = records
+            self._bump()
+
+    def _bump(self):
+        self._version += 1
+        self._updated = time.time()
+
+    def _on_portfolio(self, item):
+        con_id = item.contract.conId
+        with self._lock:
+            if not item.position:
+                self._records.pop(con_id, None)
+            else:
+                self._records[con_id] = _record(
+                    item.contract, item.position, item.averageCost, item.marketPrice,
+                    item.marketValue, item.unrealizedPNL, item.realizedPNL)
+            self._bump()
+
+    def _on_position(self, pos):
+        con_id = pos.contract.conId
+        with self._lock:
+            current = self._records.get(con_id)
+            if not pos.position:
+                self._records.pop(con_id, None)
+            elif current is None:
+                self._records[con_id] = _record(pos.contract, pos.position, pos.avgCost)
+            else:
+                self._records[con_id] = replace(
+                    current, quantity=float(pos.position), avg_cost=float(pos.avgCost), updated=time.time())
+            self._bump()
+
+    def snapshot(self) -> PortfolioSnapshot:
+        with self._lock:
+            return PortfolioSnapshot(self._version, self._updated, tuple(self._records.values()))
+
+    def get(self, con_id) -> Optional[PositionRecord]:
+        return self._records.get(con_id)
+
+    def find(self, symbol, expiry, strike, right) -> Optional[PositionRecord]:
+        right = right.upper()[:1]
+        with self._lock:
+            records = list(self._records.values())
+        for rec in records:
+            if (
+                rec.symbol == symbol and
+                rec.expiry == expiry and
+                abs(rec.strike - float(strike)) < 0.01 and
+                rec.right == right
+            ):
+                return rec
+        return None
+
+
+portfolio = PortfolioStore()
+
+
+def current_snapshot(ib=None) -> PortfolioSnapshot:
+    # Falls back to a one-off pull when nothing is streaming into the store yet
+    if not portfolio.attached:
+        portfolio.seed(ib or get_ib())
+    return portfolio.snapshot()
@@ -0,0 +1,175 @@
+import os
+import time
+import asyncio
+import logging
+from ib_insync import MarketOrder
+from dotenv import load_dotenv
+from bot.marketdata import has_quote
+from bot.orders import DONE_STATES
+
+load_dotenv()
+logger = logging.getLogger('ibkr')
+
+# join   → BUY at bid / SELL at ask
+# mid    → midpoint
+# cross  → BUY at ask / SELL at bid
+# ladder → start at join and walk to the far side in CHASE_STEPS steps within CHASE_BUDGET seconds,
+#          resting at the far side for the last slot
+POLICY = os.getenv("ORDER_PRICING", "ladder").lower()
+CHASE_STEPS = int(os.getenv("CHASE_STEPS", 4))
+CHASE_BUDGET = float(os.getenv("CHASE_BUDGET", 6))
+CHASE_MARKET_FALLBACK = os.getenv("CHASE_MARKET_FALLBACK", "false").lower() == "true"
+TICK_SIZE = float(os.getenv("TICK_SIZE", 0.01))
+# Floor between two modifies of the same order, however fast ticks arrive
+CHASE_MIN_INTERVAL = float(os.getenv("CHASE_MIN_INTERVAL", 0.25))
+# How long the market fallback waits for the limit order's cancel to land
+CHASE_CANCEL_WAIT = float(os.getenv("CHASE_CANCEL_WAIT", 2))
+
+POLICIES = ("join", "mid", "cross", "ladder")
+# A modify sent in these states races the one still in flight
+PENDING_STATES = ("PendingSubmit", "PendingCancel", "ApiPending")
+
+
+def round_tick(price, tick=TICK_SIZE):
+    return max(round(round(price / tick) * tick, 2), tick)
+
+
+def limit_price(policy, action, bid, ask, step=0, steps=CHASE_STEPS, tick=TICK_SIZE):
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown pricing policy: {policy}")
+    if action not in ("BUY", "SELL"):
+        raise ValueError("Action must be BUY or SELL")
+
+    near, far = (bid, ask) if action == "BUY" else (ask, bid)
+    if policy == "join":
+        price = near
+    elif policy == "mid":
+        price = (bid + ask) / 2
+    elif policy == "cross":
+        price = far
+    else:
+        price = near + (far - near) * min(step / max(steps, 1), 1.0)
+    return round_tick(price, tick)
+
+
+class OrderChaser:
+    # Reprices a live limit order on status changes and ticks until it is done
+    # or the time budget runs out.
+    def __init__(self, ib, trade, ticker, policy=POLICY, steps=CHASE_STEPS,
+                 budget=CHASE_BUDGET, market_fallback=CHASE_MARKET_FALLBACK, on_replace=None,
+                 min_interval=CHASE_MIN_INTERVAL):
+        self.ib = ib
+        self.trade = trade
+        self.ticker = ticker
+        self.policy = policy
+        self.steps = steps
+        self.budget = budget
+        self.market_fallback = market_fallback
+        self.on_replace = on_replace
+        self.min_interval = min_interval
+        self.reprices = 0
+        self._modified = None
+        self._wake = asyncio.Event()
+
+    def _done(self):
+        return self.trade.orderStatus.status in DONE_STATES
+
+    def _on_event(self, *args):
+        self._wake.set()
+
+    def _interval(self):
+        # steps + 1 slots, so the far touch gets its own slot before the budget ends
+        return self.budget / (max(self.steps, 1) + 1)
+
+    def _step_at(self, elapsed):
+        if self.policy != "ladder":
+            return 0
+        return min(int(elapsed / self._interval()), self.steps)
+
+    def _reprice(self, step):
+        # Returns how long until a throttled reprice may go out, 0 otherwise
+        order = self.trade.order
+        if order.orderType != "LMT" or self.trade.orderStatus.status in PENDING_STATES:
+            return 0
+        if not has_quote(self.ticker):
+            return 0
+        price = limit_price(self.policy, order.action, self.ticker.bid, self.ticker.ask, step, self.steps)
+        if abs(price - order.lmtPrice) < TICK_SIZE / 2:
+            return 0
+        now = time.monotonic()
+        if self._modified is not None and now - self._modified < self.min_interval:
+            return self.min_interval - (now - self._modified)
+        logger.info(f"🔁 Reprice {order.action} {order.orderId}: {order.lmtPrice} → {price} (step {step}/{self.steps})")
+        order.lmtPrice = price
+        self.ib.placeOrder(self.trade.contract, order)
+        self._modified = now
+        self.reprices += 1
+        return 0
+
+    async def run(self):
+        start = time.monotonic()
+        self.trade.statusEvent += self._on_event
+        self.ticker.updateEvent += self._on_event
+        try:
+            while not self._done():
+                elapsed = time.monotonic() - start
+                if elapsed >= self.budget:
+                    break
+                throttled = self._reprice(self._step_at(elapsed))
+                # Sleep until the next ladder step, a status change, a tick or
+                # the end of the throttle on a reprice that was held back
+                next_step = self._interval()
+                timeout = min(next_step - (elapsed % next_step), self.budget - elapsed)
+                if throttled:
+                    timeout = min(timeout, throttled)
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self.trade.statusEvent -= self._on_event
+            self.ticker.updateEvent -= self._on_event
+
+        if not self._done() and self.market_fallback:
+            await self._fallback_to_market()
+        logger.info(
+            f"⏱️ Order {self.trade.order.orderId} {self.trade.orderStatus.status} after "
+            f"{time.monotonic() - start:.2f}s, {self.reprices} reprices"
+        )
+        return self.trade
+
+    async def _fallback_to_market(self, wait=CHASE_CANCEL_WAIT):
+        # The chase budget is spent by now, so the cancel gets its own bound;
+        # without a confirmed cancel the remaining size is unknown and no
+        # market order goes out.
+        self.ib.cancelOrder(self.trade.order)
+        loop = asyncio.get_running_loop()
+        give_up = loop.time() + wait
+        while not self._done():
+            remaining = give_up - loop.time()
+            if remaining <= 0:
+                logger.warning(f"⚠️ Cancel of {self.trade.order.orderId} not confirmed in {wait}s, no market fallback")
+                return
+            try:
+                await asyncio.wait_for(self._status_changed(), remaining)
+            except asyncio.TimeoutError:
+                pass
+        remaining = self.trade.orderStatus.remaining
+        if remaining <= 0:
+            return
+        order = MarketOrder(self.trade.order.action, remaining)
+        order.account = self.trade.order.account
+        order.outsideRth = self.trade.order.outsideRth
+        logger.warning(f"⚠️ Chase budget spent, sending MARKET for remaining {remaining}")
+        replaced, self.trade = self.trade, self.ib.placeOrder(self.trade.contract, order)
+        if self.on_replace is not None:
+            self.on_replace(replaced, self.trade)
+
+
+    async def _status_changed(self):
+        await self.trade.statusEvent
+
+
+async def chase(ib, trade, ticker, **kwargs):
+    return await OrderChaser(ib, trade, ticker, **kwargs).run()
@@ -0,0 +1,116 @@
+import threading
+
+try:
+    import tiktoken
+except ImportError:  # token counts fall back to an estimate
+    tiktoken = None
+
+# Static instructions come first and never change between calls, so the
+# provider can serve this prefix from its prompt cache. Anything live goes
+# after it, in POSITIONS.
+INSTRUCTIONS = (
+    "You are the best trader and an expert in quantitative options trading. "
+    "You will be given a prompt containing any kind of message — it could be a direct trade alert, news update, or a speculative idea. "
+    "Your task is to carefully analyze the message and infer whether the most appropriate action is one of the following: "
+    "(1) BUY — if the message contains a clear, actionable trade entry signal, or if it starts with day trade: for example,Daytrade Contract: QQQ 6/23 525P Entry: 1.24"
+    "(2) SELL — if the message recommends trimming, taking profit, or exiting a position, or even SL to be or profit (stoploss to breakeven, you would sell in this case too); "
+    "(3) SPECULATE — if the message is commentary or watch-only. "
+    "The action can only be one of BUY, SELL, and SPECULATE. "
+    "You can only return SELL if your current holding of this quantity is strictly larger than 0. "
+    "If relevant, extract: symbol, right (C or P), expiry (YYYYMMDD), strike (number), qty (int). "
+    "Quantity for BUY is 4 unless specified. Quantity for SELL is 1 unless specified."
+    "comments like closed all, out of the rest, runners left, sl to be, last trim for me means sell ALL position rest of the contracts from the open positions. talking about bad PA, or saying there you go is NOT a sell trigger"
+    "if any field is missing but the open positions contain a symbol AND an option type (call/put) that matches the symbol in the message,"
+    "you should infer the missing fields from the open positions. "
+    "For example, if POSITIONS has QQQ C 525 20250908 +3, and my message says 'trim qqq calls', "
+    "you should report: {\"action\":\"SELL\",\"symbol\":\"QQQ\",\"right\":\"C\",\"expiry\":\"20250908\",\"strike\":525,\"qty\":1} "
+    "but if it says trim puts, then you shouldn't return a sell trigger."
+    "if a loss is taken (eg. a negative percent return like -20%, then the entire position for that contract should be closed. if you have 3 contracts and a loss is taken, then all 3 should be sold"
+    "If no reasonable match exists, or if no position qualifies for SELL, report a single SPECULATE with every other field null. "
+    "If no symbol is explicitly mentioned in the message and there is more than one open position, you must report a single SPECULATE with every other field null. Only infer the symbol if there is exactly one open position with words like personally going to add more here"
+    "The expiry must be 2025 unless I explicitly specify otherwise. If unsure, default to a valid 2025 expiry date. "
+    "Always answer by calling report_trades, with one entry per trade leg when a message holds several. "
+    "Open positions are listed after POSITIONS, one per line as SYMBOL RIGHT STRIKE EXPIRY SIGNED_QTY."
+)
+
+
+def _strike(value):
+    return f"{value:g}" if value else "-"
+
+
+def encode_positions(records):
+    # One short line per open option leg, sorted so the same book always
+    # encodes to the same bytes (and the same decision cache key)
+    lines = sorted(
+        f"{r.symbol} {r.right or '-'} {_strike(r.strike)} {r.expiry or '-'} {r.quantity:+g}"
+        for r in records if r.quantity
+    )
+    return "\n".join(lines) if lines else "none"
+
+
+def build_system_prompt(positions):
+    return f"{INSTRUCTIONS}\nPOSITIONS:\n{positions}"
+
+
+class PromptStats:
+    # Token accounting per request: what we send (counted locally, an estimate
+    # without tiktoken), and what the provider's usage reports as sent and as
+    # served from its prefix cache.
+    def __init__(self, model="gpt-4o"):
+        self._lock = threading.Lock()
+        self._encoding = None
+        if tiktoken is not None:
+            try:
+                self._encoding = tiktoken.encoding_for_model(model)
+            except Exception:
+                self._encoding = None
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.measured = 0
+        self.measured_tokens = 0
+        self.cached_tokens = 0
+        self.prefix_tokens = self.count(INSTRUCTIONS)
+
+    def count(self, text):
+        if self._encoding is not None:
+            return len(self._encoding.encode(text))
+        return len(text) // 4
+
+    @property
+    def estimated(self):
+        return self._encoding is None
+
+    def record(self, system_prompt, user_prompt):
+        sent = self.count(system_prompt) + self.count(user_prompt)
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += sent
+        approx = "~" if self.estimated else ""
+        print(f"[LLM] Prompt tokens: {approx}{sent} (static prefix {approx}{self.prefix_tokens})")
+        return sent
+
+    def usage(self, usage):
+        # The API's own count, read off the end of the stream
+        sent = getattr(usage, "prompt_tokens", None) or 0
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", 0) or 0
+        with self._lock:
+            self.measured += 1
+            self.measured_tokens += sent
+            self.cached_tokens += cached
+        print(f"[LLM] Provider usage: {sent} prompt tokens, {cached} cached")
+
+    def report(self):
+        approx = "~" if self.estimated else ""
+        average = self.prompt_tokens / self.requests if self.requests else 0
+        if self.measured_tokens:
+            cache = f"{self.cached_tokens / self.measured_tokens:.0%} served from cache ({self.measured} reported)"
+        else:
+            cache = "cache share not reported yet"
+        return (
+            f"🧾 Prompt: {self.requests} requests, {approx}{average:.0f} tokens avg, "
+            f"{cache}, static prefix {approx}{self.prefix_tokens} tokens"
+        )
+
+
+stats = PromptStats()
@@ -0,0 +1,97 @@
+import time
+import asyncio
+import logging
+
+logger = logging.getLogger('ibkr')
+
+
+def trade_key(trade):
+    # Everything on the same contract runs in arrival order
+    return (
+        str(trade.get("symbol", "")).upper(),
+        str(trade.get("expiry", "")),
+        str(trade.get("strike", "")),
+        str(trade.get("contract_type", "")).upper()[:1],
+    )
+
+
+class KeyStats:
+    def __init__(self):
+        self.submitted = 0
+        self.completed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @property
+    def depth(self):
+        return self.submitted - self.completed
+
+    @property
+    def avg_wait(self):
+        return self.total_wait / self.completed if self.completed else 0.0
+
+
+class KeyedScheduler:
+    # One FIFO lane per key: jobs on the same key run strictly in order,
+    # different keys run concurrently.
+    def __init__(self, key_fn=trade_key, idle_timeout=60):
+        self.key_fn = key_fn
+        self.idle_timeout = idle_timeout
+        self._lanes = {}
+        self._workers = {}
+        self.stats = {}
+
+    def submit(self, job, coro_fn):
+        key = self.key_fn(job)
+        lane = self._lanes.get(key)
+        if lane is None:
+            lane = self._lanes[key] = asyncio.Queue()
+        stats = self.stats.setdefault(key, KeyStats())
+        future = asyncio.get_running_loop().create_future()
+        lane.put_nowait((time.monotonic(), job, coro_fn, future))
+        stats.submitted += 1
+        if key not in self._workers or self._workers[key].done():
+            self._workers[key] = asyncio.create_task(self._drain(key, lane))
+        return future
+
+    async def run(self, job, coro_fn):
+        return await self.submit(job, coro_fn)
+
+    async def _drain(self, key, lane):
+        stats = self.stats[key]
+        while True:
+            try:
+                queued_at, job, coro_fn, future = await asyncio.wait_for(lane.get(), self.idle_timeout)
+            except asyncio.TimeoutError:
+                if lane.empty():
+                    self._lanes.pop(key, None)
+                    self._workers.pop(key, None)
+                    return
+                continue
+            waited = time.monotonic() - queued_at
+            stats.total_wait += waited
+            stats.max_wait = max(stats.max_wait, waited)
+            try:
+                result = await coro_fn(job)
+                if not future.done():
+                    future.set_result(result)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                stats.completed += 1
+                lane.task_done()
+
+    def report(self):
+        if not self.stats:
+            return "📭 No trades scheduled yet."
+        lines = []
+        for key, s in self.stats.items():
+            lines.append(
+                f"🧵 {' '.join(k for k in key if k)} | depth: {s.depth} | done: {s.completed} | "
+                f"avg wait: {s.avg_wait * 1000:.0f}ms | max wait: {s.max_wait * 1000:.0f}ms"
+            )
+        return "\n".join(lines)
+
+
+scheduler = KeyedScheduler()
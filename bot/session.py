@@ -0,0 +1,181 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from ib_insync import IB
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger('ibkr')
+
+# IBKR connection info
+HOST = os.getenv("HOSTID", "127.0.0.1")
+PORT = int(os.getenv("ENVIRONMENT", 4001))
+
+# clientIds are handed out from [CLIENTID, CLIENTID + IB_CLIENT_POOL) so two
+# sessions can never collide on the same id
+CLIENT_ID_BASE = int(os.getenv("CLIENTID", 1))
+CLIENT_POOL_SIZE = int(os.getenv("IB_CLIENT_POOL", 16))
+CONNECT_TIMEOUT = float(os.getenv("IB_CONNECT_TIMEOUT", 4))
+RECONNECT_BACKOFF = (0.5, 1, 2, 5)
+
+
+class Session:
+    # One warm IB connection. ib_insync binds a client to the event loop it
+    # connected on, so a session is only ever used from the thread that made it.
+    def __init__(self, name, client_id):
+        self.name = name
+        self.client_id = client_id
+        self.thread_id = threading.get_ident()
+        self.ib = IB()
+        self.ib.disconnectedEvent += self._on_disconnected
+        self.connected_at = None
+        self.reconnects = 0
+        self._closing = False
+        # The background reconnect and a caller's connect must not both run
+        # connectAsync on this client: IB rejects the second (error 326)
+        self._connect_lock = asyncio.Lock()
+
+    def _on_disconnected(self):
+        if self._closing:
+            return
+        logger.warning(f"⚠️ IB session '{self.name}' (clientId={self.client_id}) dropped, will reconnect")
+        # Reconnect in the background when the session lives on a running loop,
+        # otherwise the next get() reconnects before handing the client out
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        loop.create_task(self._reconnect())
+
+    async def _reconnect(self):
+        try:
+            await self.ensure_connected_async()
+        except ConnectionError as e:
+            logger.error(f"❌ {e}")
+
+    def ensure_connected(self):
+        # Blocking callers get a single attempt and fail fast, retrying with
+        # backoff is the async sessions' job
+        if self.ib.isConnected():
+            return self.ib
+        try:
+            self.ib.connect(HOST, PORT, clientId=self.client_id, timeout=CONNECT_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"❗ IB session '{self.name}' connect failed: {e}")
+            raise ConnectionError(f"IB session '{self.name}' could not connect: {e}")
+        if self.connected_at is not None:
+            self.reconnects += 1
+        self.connected_at = time.time()
+        logger.info(f"✅ IB session '{self.name}' connected (clientId={self.client_id})")
+        return self.ib
+
+    async def ensure_connected_async(self):
+        if self.ib.isConnected():
+            return self.ib
+        async with self._connect_lock:
+            # Whoever held the lock may have connected already
+            if self.ib.isConnected():
+                return self.ib
+            return await self._connect_with_backoff()
+
+    async def _connect_with_backoff(self):
+        last_error = None
+        for delay in (0,) + RECONNECT_BACKOFF:
+            if delay:
+                await asyncio.sleep(delay)
+            try:
+                await self.ib.connectAsync(HOST, PORT, clientId=self.client_id, timeout=CONNECT_TIMEOUT)
+                if self.connected_at is not None:
+                    self.reconnects += 1
+                self.connected_at = time.time()
+                logger.info(f"✅ IB session '{self.name}' connected (clientId={self.client_id})")
+                return self.ib
+            except Exception as e:
+                last_error = e
+                logger.warning(f"❗ IB session '{self.name}' connect failed: {e}")
+        raise ConnectionError(f"IB session '{self.name}' could not connect: {last_error}")
+
+    def close(self):
+        self._closing = True
+        if self.ib.isConnected():
+            self.ib.disconnect()
+
+
+class SessionManager:
+    def __init__(self, base_id=CLIENT_ID_BASE, pool_size=CLIENT_POOL_SIZE):
+        self._lock = threading.Lock()
+        self._free_ids = list(range(base_id, base_id + pool_size))
+        self._sessions = {}
+
+    def _session(self, name):
+        key = (name, threading.get_ident())
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                if not self._free_ids:
+                    raise RuntimeError("IB clientId pool exhausted, raise IB_CLIENT_POOL")
+                session = Session(name, self._free_ids.pop(0))
+                self._sessions[key] = session
+        return session
+
+    def get(self, name="helpers"):
+        # Returns a connected IB for `name` on the calling thread, reusing the
+        # warm connection when there is one.
+        return self._session(name).ensure_connected()
+
+    async def get_async(self, name="trading"):
+        return await self._session(name).ensure_connected_async()
+
+    def peek(self, name):
+        # Returns the IB for `name` on the calling thread without connecting.
+        session = self._sessions.get((name, threading.get_ident()))
+        return session.ib if session else None
+
+    def release(self, name):
+        key = (name, threading.get_ident())
+        with self._lock:
+            session = self._sessions.pop(key, None)
+            if session:
+                self._free_ids.append(session.client_id)
+        if session:
+            session.close()
+
+    def close_all(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+            for session in sessions:
+                self._free_ids.append(session.client_id)
+        for session in sessions:
+            session.close()
+
+    def status(self):
+        lines = []
+        for (name, thread_id), s in list(self._sessions.items()):
+            state = "🟢" if s.ib.isConnected() else "🔴"
+            lines.append(f"{state} {name} | clientId={s.client_id} | thread={thread_id} | reconnects={s.reconnects}")
+        return "\n".join(lines) if lines else "No IB sessions."
+
+
+sessions = SessionManager()
+
+
+def get_ib(name="helpers"):
+    return sessions.get(name)
+
+
+def _helper_thread():
+    # ib_insync needs an event loop of its own in this thread
+    asyncio.set_event_loop(asyncio.new_event_loop())
+
+
+# Blocking helper scripts all run on this one thread, so they share a single
+# "helpers" session (and clientId) instead of one per executor thread
+helpers_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ib-helpers", initializer=_helper_thread)
+
+
+async def run_helper(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(helpers_executor, func, *args)
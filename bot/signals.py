@@ -0,0 +1,160 @@
+import json
+from dataclasses import dataclass
+from datetime import datetime, date
+from typing import List, Optional
+
+ACTIONS = ("BUY", "SELL", "SPECULATE")
+
+# Strict JSON schema for the LLM tool call. Field names are kept short on
+# purpose, every output token is generation latency.
+TRADE_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "report_trades",
+        "description": "Report one decision per trade leg found in the message.",
+        "strict": True,
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "trades": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "action": {"type": "string", "enum": list(ACTIONS)},
+                            "symbol": {"type": ["string", "null"]},
+                            "right": {"type": ["string", "null"], "enum": ["C", "P", None]},
+                            "expiry": {"type": ["string", "null"], "description": "YYYYMMDD"},
+                            "strike": {"type": ["number", "null"]},
+                            "qty": {"type": ["integer", "null"]},
+                        },
+                        "required": ["action", "symbol", "right", "expiry", "strike", "qty"],
+                        "additionalProperties": False,
+                    },
+                },
+            },
+            "required": ["trades"],
+            "additionalProperties": False,
+        },
+    },
+}
+TOOL_CHOICE = {"type": "function", "function": {"name": "report_trades"}}
+
+# Burst variant: several numbered messages in, one decision list per message out
+BATCH_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "report_batch",
+        "description": "Report the trade legs of every numbered message, one entry per message.",
+        "strict": True,
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "messages": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "index": {"type": "integer"},
+                            "trades": TRADE_TOOL["function"]["parameters"]["properties"]["trades"],
+                        },
+                        "required": ["index", "trades"],
+                        "additionalProperties": False,
+                    },
+                },
+            },
+            "required": ["messages"],
+            "additionalProperties": False,
+        },
+    },
+}
+BATCH_TOOL_CHOICE = {"type": "function", "function": {"name": "report_batch"}}
+
+
+def _roll_forward(expiry, today=None):
+    # Models like to emit last year's date for "6/23", move it to the next occurrence
+    today = today or date.today()
+    parsed = datetime.strptime(expiry, "%Y%m%d").date()
+    if parsed >= today:
+        return expiry
+    rolled = parsed.replace(year=today.year)
+    if rolled < today:
+        rolled = rolled.replace(year=today.year + 1)
+    return rolled.strftime("%Y%m%d")
+
+
+@dataclass(frozen=True)
+class TradeSignal:
+    action: str
+    symbol: Optional[str] = None
+    right: Optional[str] = None
+    expiry: Optional[str] = None
+    strike: Optional[float] = None
+    quantity: Optional[int] = None
+
+    @property
+    def actionable(self):
+        return self.action in ("BUY", "SELL")
+
+    @classmethod
+    def from_dict(cls, raw):
+        action = str(raw.get("action") or "").strip().upper()
+        if action not in ACTIONS:
+            raise ValueError(f"Invalid action: {action}")
+        if action == "SPECULATE":
+            return cls(action)
+
+        symbol = str(raw.get("symbol") or "").strip().upper()
+        right = str(raw.get("right") or "").strip().upper()[:1]
+        expiry = str(raw.get("expiry") or "").strip()
+        strike = raw.get("strike")
+        quantity = raw.get("qty", raw.get("quantity"))
+
+        if not symbol.isalnum():
+            raise ValueError(f"Invalid symbol: {symbol}")
+        if right not in ("C", "P"):
+            raise ValueError(f"Invalid contract_type: {right}")
+        if not (expiry.isdigit() and len(expiry) == 8):
+            raise ValueError(f"Invalid expiry: {expiry}")
+        if not isinstance(strike, (int, float)) or strike <= 0:
+            raise ValueError(f"Invalid strike: {strike}")
+        if not isinstance(quantity, int) or quantity <= 0:
+            raise ValueError(f"Invalid quantity: {quantity}")
+        return cls(action, symbol, right, _roll_forward(expiry), float(strike), quantity)
+
+    def to_trade(self, source):
+        # Same dict shape handle_trade has always consumed
+        return {
+            "symbol": self.symbol,
+            "contract_type": self.right,
+            "expiry": self.expiry,
+            "strike": self.strike,
+            "action": self.action,
+            "quantity": self.quantity,
+            "timestamp": datetime.utcnow().isoformat(),
+            "source": source,
+        }
+
+
+def parse_signals(arguments) -> List[TradeSignal]:
+    payload = json.loads(arguments) if isinstance(arguments, str) else arguments
+    signals = []
+    for raw in payload.get("trades", []):
+        try:
+            signals.append(TradeSignal.from_dict(raw))
+        except ValueError as e:
+            print(f"[!] Dropped trade leg {raw}: {e}")
+    return signals
+
+
+
+def split_batch(arguments, count):
+    # report_batch arguments → one report_trades payload per message, in order.
+    # Messages the model skipped come back as None.
+    payload = json.loads(arguments) if isinstance(arguments, str) else arguments
+    results = [None] * count
+    for entry in payload.get("messages", []):
+        index = entry.get("index")
+        if isinstance(index, int) and 1 <= index <= count:
+            results[index - 1] = json.dumps({"trades": entry.get("trades", [])})
+    return results
@@ -1,121 +1,122 @@
 import os
 import logging
-from ib_insync import IB, Option, MarketOrder, LimitOrder, util
+from ib_insync import MarketOrder, LimitOrder, util
 from dotenv import load_dotenv
-from concurrent.futures import ThreadPoolExecutor
-import time
-import math
+import asyncio
+from bot.session import sessions
+from bot.contracts import contracts
+from bot.portfolio import portfolio, current_snapshot
+from bot.marketdata import market_data, has_quote
+from bot.pricing import POLICY, CHASE_MARKET_FALLBACK, limit_price, chase
+from bot.orders import cancel_orders, flatten_all
+from bot.pnl import pnl
+from bot.journal import journal
+from bot.brackets import brackets, BRACKET_ENTRIES
 # Setup
 load_dotenv()
 util.patchAsyncio()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger('ibkr')
 
-# IBKR connection info
-HOST = os.getenv("HOSTID", "127.0.0.1")
-PORT = int(os.getenv("ENVIRONMENT", 4001))
-CLIENT_ID = int(os.getenv("CLIENTID", 1))
-
-# IBKR setup
-ib = IB()
-executor = ThreadPoolExecutor(max_workers=1)
-
-def connect_ib():
-    if not ib.isConnected():
-        ib.connect(HOST, PORT, clientId=CLIENT_ID)
-        logger.info("✅ Connected to IBKR")
-
-def resolve_contract(symbol, expiry, strike, right):
-    contract = Option(symbol, expiry, strike, right, exchange="SMART", currency="USD")
-    ib.qualifyContracts(contract)
-    if not contract.conId:
-        raise ValueError("Contract qualification failed")
-    return contract
-
-def cancel_pending_orders():
-    connect_ib()  # Ensure we're connected
-    ib.reqAllOpenOrders()
-    ib.sleep(1)
-
-    open_trades = ib.openTrades()
-    cancelled = []
-
-    for trade in open_trades:
-        order_id = trade.order.orderId
-        status = trade.orderStatus.status
-        filled = trade.orderStatus.filled
-
-        if status in ('Submitted', 'PreSubmitted', 'PendingSubmit') and filled == 0:
-            ib.cancelOrder(trade.order)
-            logger.info(f"🔁 Sent cancel request for Order {order_id}")
-            ib.sleep(0.5)
-
-            # Confirm cancellation
-            ib.reqAllOpenOrders()
-            ib.sleep(0.5)
-            remaining_orders = [o.orderId for o in ib.openOrders()]
-            if order_id not in remaining_orders:
-                logger.info(f"✅ Confirmed cancelled: Order {order_id}")
-                cancelled.append(order_id)
-            else:
-                logger.warning(f"❗ Still active or partially filled: Order {order_id}")
-
-    if not cancelled:
-        logger.info("📭 No eligible pending orders to cancel")
-    return cancelled
-
-
-def place_order(contract, action, quantity):
-    # Request live market data
-    ticker = ib.reqMktData(contract, "", False, False)
-
-    # Poll for market data up to 5 seconds
-    start = time.time()
-    while (
-        ticker.bid is None or ticker.ask is None or
-        math.isnan(ticker.bid) or math.isnan(ticker.ask)
-    ) and time.time() - start < 10:
-        ib.sleep(0.2)
-
-    ask_price = ticker.ask
-    bid_price = ticker.bid
+ACK_TIMEOUT = float(os.getenv("ORDER_ACK_TIMEOUT", 5))
+ACK_STATES = ("PreSubmitted", "Submitted", "Filled")
+REJECT_STATES = ("Cancelled", "ApiCancelled", "Inactive")
+
+async def connect_ib():
+    # Warm, auto-reconnecting connection on the bot's event loop. Everything
+    # that touches it runs on that loop, ib_insync clients are not thread-safe.
+    ib = await sessions.get_async("trading")
+    if not portfolio.attached:
+        portfolio.attach(ib)
+    if not market_data.attached:
+        market_data.attach(ib, [pos.contract for pos in portfolio.snapshot().records])
+    if not pnl.ready:
+        pnl.attach(ib, [pos.con_id for pos in portfolio.snapshot().records])
+    if not journal.attached:
+        journal.attach(ib)
+    return ib
+
+async def resolve_contract(ib, symbol, expiry, strike, right):
+    # Served from the contract cache, only a miss costs a qualification round trip
+    return await contracts.get_async(ib, symbol, expiry, strike, right)
+
+# IB only honours a cancel from the clientId that placed the order, so the
+# bot cancels and flattens its own orders here, on the trading session
+async def cancel_pending_orders(symbol=None, side=None):
+    ib = await connect_ib()
+    return await cancel_orders(ib, symbol, side)
+
+
+async def flatten_positions():
+    ib = await connect_ib()
+    return await flatten_all(ib, portfolio.snapshot().records)
+
+
+async def place_order(ib, contract, action, quantity, ticker, on_replace=None):
+    if action not in ("BUY", "SELL"):
+        raise ValueError("Action must be BUY or SELL")
+
+    bid_price, ask_price = ticker.bid, ticker.ask
     print("ask price:", ask_price)
     print("bid price:", bid_price)
 
-    ib.cancelMktData(contract)
-
     accounts = ib.managedAccounts()
     if not accounts:
         raise ValueError("No managed accounts available")
 
     # Decide order type
-    if (
-        ask_price is None or bid_price is None or
-        math.isnan(ask_price) or math.isnan(bid_price)
-    ):
+    if not has_quote(ticker):
         logger.warning("⚠️ Falling back to MARKET order due to missing or invalid bid/ask")
         order = MarketOrder(action, quantity)
     else:
-        if action == "SELL":
-            price = ask_price
-            order = LimitOrder(action, quantity, price)
-            logger.info(f"✅ SELL at ask price {price}")
-        elif action == "BUY":
-            price = bid_price
-            order = LimitOrder(action, quantity, price)
-            logger.info(f"✅ BUY at bid price {price}")
-        else:
-            raise ValueError("Action must be BUY or SELL")
+        price = limit_price(POLICY, action, bid_price, ask_price)
+        order = LimitOrder(action, quantity, price)
+        logger.info(f"✅ {action} at {price} ({POLICY}, bid {bid_price} / ask {ask_price})")
 
     order.account = accounts[0]
     order.outsideRth = True
 
-    # Place the order
-    trade = ib.placeOrder(contract, order)
+    # Place the order, BUY limits optionally carry broker-side TP/SL children
+    bracketed = BRACKET_ENTRIES and action == "BUY" and order.orderType == "LMT"
+    if bracketed:
+        trade = brackets.submit(ib, contract, quantity, order.lmtPrice, order.account)
+    else:
+        trade = ib.placeOrder(contract, order)
     if trade is None:
         logger.error("❌ Order placement failed: ib.placeOrder returned None")
+        return None
 
     logger.info(f"✅ Order submitted: {action} {quantity} {contract.symbol}")
+    if order.orderType == "LMT":
+        # Keep working the order toward the far side until it fills or the budget runs out.
+        # Cancelling a bracket parent for a market fallback would cancel its exits too.
+        asyncio.ensure_future(chase(ib, trade, ticker, market_fallback=CHASE_MARKET_FALLBACK and not bracketed,
+                                    on_replace=on_replace))
+    return trade
+
+
+async def wait_for_ack(trade, timeout=ACK_TIMEOUT):
+    # Resolves on the first orderStatus that shows IB accepted or refused the order
+    status = trade.orderStatus.status
+    if status not in ACK_STATES + REJECT_STATES:
+        acked = asyncio.get_running_loop().create_future()
+
+        def on_status(t):
+            if t.orderStatus.status in ACK_STATES + REJECT_STATES and not acked.done():
+                acked.set_result(t.orderStatus.status)
+
+        trade.statusEvent += on_status
+        try:
+            status = await asyncio.wait_for(acked, timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ No ack for Order {trade.order.orderId} within {timeout}s")
+            return trade
+        finally:
+            trade.statusEvent -= on_status
+
+    if status in REJECT_STATES and not trade.orderStatus.filled:
+        message = trade.log[-1].message if trade.log else status
+        raise ValueError(f"Order {trade.order.orderId} rejected: {message}")
     return trade
 
 # def place_order(contract, action, quantity):
@@ -145,28 +146,40 @@ def place_order(contract, action, quantity):
 #     return trade
 #
 
-def handle_trade(trade_data):
-    try:
-        connect_ib()
-
-        symbol = trade_data['symbol']
-        expiry = trade_data['expiry']
-        strike = trade_data['strike']
-        right = trade_data['contract_type']
-        action = trade_data['action']
-
-        # 🚨 SAFETY CHECK: block naked SELLs
-        if action.upper() == "SELL" and not has_contract_position(symbol, expiry, strike, right, ib):
-            logger.warning(f"🛑 Blocked SELL — no position found for {symbol} {strike} {right} {expiry}")
-            return None
-
-        contract = resolve_contract(symbol, expiry, strike, right)
-        trade = place_order(contract, action, trade_data['quantity'])
-
-        return trade
-    except Exception as e:
-        logger.error(f"Trade failed: {e}")
-        return None
+async def handle_trade(trade_data):
+    # Raises on anything that keeps the order from working (blocked, rejected,
+    # not placed) so the caller can report the real reason
+    ib = await connect_ib()
+
+    symbol = trade_data['symbol']
+    expiry = trade_data['expiry']
+    strike = trade_data['strike']
+    right = trade_data['contract_type']
+    action = trade_data['action']
+
+    # 🚨 SAFETY CHECK: block naked SELLs
+    if action.upper() == "SELL" and not has_contract_position(symbol, expiry, strike, right, ib):
+        logger.warning(f"🛑 Blocked SELL — no position found for {symbol} {strike} {right} {expiry}")
+        raise ValueError(f"Blocked SELL — no position found for {symbol} {strike} {right} {expiry}")
+
+    contract = await resolve_contract(ib, symbol, expiry, strike, right)
+    ticker = await market_data.wait_quote(contract)
+    on_replace = None
+    if action.upper() == "SELL":
+        held = portfolio.find(symbol, expiry, strike, right)
+        held_quantity = held.quantity if held else 0
+
+        def on_replace(old, new):
+            # A market fallback keeps shrinking the bracket exits as it fills
+            brackets.after_sell(ib, new, held_quantity - old.orderStatus.filled)
+
+    trade = await place_order(ib, contract, action, trade_data['quantity'], ticker, on_replace)
+    if trade is None:
+        raise RuntimeError(f"Order for {symbol} {strike} {right} {expiry} was not placed")
+    if action.upper() == "SELL":
+        brackets.after_sell(ib, trade, held_quantity)
+    # Raises ValueError with IB's own message on a reject
+    return await wait_for_ack(trade)
 
 
 def fetch_ibkr_positions_string(ib):
@@ -188,21 +201,8 @@ def fetch_ibkr_positions_string(ib):
         return "No open positions"
 
 
-def submit_trade(trade_data):
-    future = executor.submit(handle_trade, trade_data)
-    return future
-
-def has_contract_position(symbol, expiry, strike, right, ib=ib):
-    ib.qualifyContracts(Option(symbol, expiry, strike, right, exchange="SMART"))
-    positions = ib.positions()
-    for pos in positions:
-        c = pos.contract
-        if (
-            c.symbol == symbol and
-            c.lastTradeDateOrContractMonth == expiry and
-            abs(c.strike - strike) < 0.01 and
-            c.right.upper()[0] == right.upper()[0] and
-            pos.position > 0
-        ):
-            return True
-    return False
+def has_contract_position(symbol, expiry, strike, right, ib=None):
+    if not portfolio.attached:
+        current_snapshot(ib)
+    pos = portfolio.find(symbol, expiry, strike, right)
+    return pos is not None and pos.quantity > 0
@@ -0,0 +1,216 @@
+import os
+import sys
+import json
+import math
+import zlib
+import random
+import threading
+from dotenv import load_dotenv
+from bot.llmcache import normalize
+
+load_dotenv()
+
+MODEL_FILE = os.getenv("TRIAGE_MODEL", os.path.join("config", "triage_model.json"))
+LOG_FILE = os.getenv("TRIAGE_LOG", os.path.join("config", "triage_log.jsonl"))
+THRESHOLD = float(os.getenv("TRIAGE_THRESHOLD", 0.9))
+# Shadow mode predicts and scores against the LLM but never skips a call
+SHADOW = os.getenv("TRIAGE_SHADOW", "true").lower() == "true"
+
+LABELS = ("entry", "exit", "noise")
+BUCKETS = 1 << 18
+
+
+def features(text):
+    # Hashed word unigrams/bigrams plus character trigrams, so tickers and
+    # strikes like "525p" still share signal with unseen ones
+    text = normalize(text)
+    words = text.split()
+    grams = [f"w:{w}" for w in words]
+    grams += [f"b:{a} {b}" for a, b in zip(words, words[1:])]
+    padded = f" {text} "
+    grams += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+    counts = {}
+    for gram in grams:
+        bucket = zlib.crc32(gram.encode()) % BUCKETS
+        counts[bucket] = counts.get(bucket, 0.0) + 1.0
+    norm = math.sqrt(sum(v * v for v in counts.values())) or 1.0
+    return {k: v / norm for k, v in counts.items()}
+
+
+def label_for(signals):
+    # The LLM's decision on a message, collapsed to a triage class
+    actions = {signal.action for signal in signals}
+    if "BUY" in actions:
+        return "entry"
+    if "SELL" in actions:
+        return "exit"
+    return "noise"
+
+
+class TriageModel:
+    # Multinomial logistic regression over hashed n-grams, pure Python.
+    def __init__(self, weights=None, bias=None):
+        self.weights = weights or {label: {} for label in LABELS}
+        self.bias = bias or {label: 0.0 for label in LABELS}
+
+    def probabilities(self, feats):
+        scores = {
+            label: self.bias[label] + sum(self.weights[label].get(k, 0.0) * v for k, v in feats.items())
+            for label in LABELS
+        }
+        top = max(scores.values())
+        exp = {label: math.exp(score - top) for label, score in scores.items()}
+        total = sum(exp.values())
+        return {label: value / total for label, value in exp.items()}
+
+    def predict(self, text):
+        probs = self.probabilities(features(text))
+        label = max(probs, key=probs.get)
+        return label, probs[label]
+
+    @classmethod
+    def train(cls, examples, epochs=8, lr=0.5, l2=1e-5, seed=7):
+        # examples: [(text, label)], SGD on the softmax loss
+        model = cls()
+        data = [(features(text), label) for text, label in examples if label in LABELS]
+        rng = random.Random(seed)
+        for _ in range(epochs):
+            rng.shuffle(data)
+            for feats, label in data:
+                probs = model.probabilities(feats)
+                for name in LABELS:
+                    grad = probs[name] - (1.0 if name == label else 0.0)
+                    weights = model.weights[name]
+                    for k, v in feats.items():
+                        w = weights.get(k, 0.0)
+                        weights[k] = w - lr * (grad * v + l2 * w)
+                    model.bias[name] -= lr * grad
+        return model
+
+    def save(self, path=MODEL_FILE):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({
+                "buckets": BUCKETS,
+                "bias": self.bias,
+                "weights": {label: {str(k): round(v, 6) for k, v in w.items() if abs(v) > 1e-6}
+                            for label, w in self.weights.items()},
+            }, f)
+
+    @classmethod
+    def load(cls, path=MODEL_FILE):
+        with open(path) as f:
+            raw = json.load(f)
+        if raw.get("buckets") != BUCKETS:
+            raise ValueError(f"Model built for {raw.get('buckets')} buckets, expected {BUCKETS}")
+        weights = {label: {int(k): v for k, v in raw["weights"].get(label, {}).items()} for label in LABELS}
+        return cls(weights, raw["bias"])
+
+
+class Triage:
+    # Gate in front of the LLM: confident "noise" predictions skip the call.
+    # Every LLM decision is logged as a training example for the next model.
+    def __init__(self, model_path=MODEL_FILE, log_path=LOG_FILE, threshold=THRESHOLD, shadow=SHADOW):
+        self.threshold = threshold
+        self.shadow = shadow
+        self.log_path = log_path
+        self._lock = threading.Lock()
+        self.model = None
+        if model_path and os.path.exists(model_path):
+            try:
+                self.model = TriageModel.load(model_path)
+            except Exception as e:
+                print(f"[!] Triage model not loaded: {e}")
+        self.skipped = 0
+        self.compared = 0
+        self.agreed = 0
+        self._predictions = {}
+
+    def skip(self, text):
+        if self.model is None:
+            return False
+        label, confidence = self.model.predict(text)
+        if self.shadow or label != "noise" or confidence < self.threshold:
+            # Kept until observe() or forget() for the LLM's answer to score
+            with self._lock:
+                self._predictions[text] = label
+            return False
+        with self._lock:
+            self.skipped += 1
+        print(f"[🗑] Triage: noise ({confidence:.0%}), LLM skipped")
+        return True
+
+    def observe(self, text, signals):
+        # Called with the LLM's answer: score the shadow prediction and log the example
+        with self._lock:
+            predicted = self._predictions.pop(text, None)
+            if not signals:
+                # LLM error or empty answer, nothing to learn from
+                return
+            label = label_for(signals)
+            if predicted is not None:
+                self.compared += 1
+                self.agreed += predicted == label
+            if self.log_path:
+                try:
+                    os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+                    with open(self.log_path, "a") as f:
+                        f.write(json.dumps({"text": text, "label": label}) + "\n")
+                except OSError as e:
+                    print(f"[!] Triage log not written: {e}")
+
+    def forget(self, text):
+        # The message never reached observe(): LLM error, cancellation
+        with self._lock:
+            self._predictions.pop(text, None)
+
+    def report(self):
+        if self.model is None:
+            return "🗂 Triage: no model loaded"
+        agreement = self.agreed / self.compared if self.compared else 0.0
+        mode = "shadow" if self.shadow else f"live @ {self.threshold:.0%}"
+        return (
+            f"🗂 Triage ({mode}): {self.skipped} LLM calls skipped, "
+            f"{agreement:.0%} agreement over {self.compared} decisions"
+        )
+
+
+def load_examples(path=LOG_FILE):
+    examples = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                examples.append((row["text"], row["label"]))
+    return examples
+
+
+def main(argv):
+    # python -m bot.triage [log.jsonl] [model.json]
+    log_path = argv[1] if len(argv) > 1 else LOG_FILE
+    model_path = argv[2] if len(argv) > 2 else MODEL_FILE
+    examples = load_examples(log_path)
+    rng = random.Random(7)
+    rng.shuffle(examples)
+    split = max(1, len(examples) // 5)
+    held_out, training = examples[:split], examples[split:]
+
+    model = TriageModel.train(training)
+    correct = skipped = wrong_skips = 0
+    for text, label in held_out:
+        predicted, confidence = model.predict(text)
+        correct += predicted == label
+        if predicted == "noise" and confidence >= THRESHOLD:
+            skipped += 1
+            wrong_skips += label != "noise"
+    print(f"Held-out accuracy: {correct}/{len(held_out)}")
+    print(f"Would skip {skipped}/{len(held_out)} at {THRESHOLD:.0%}, {wrong_skips} of them actionable")
+
+    TriageModel.train(examples).save(model_path)
+    print(f"Saved {model_path} from {len(examples)} examples")
+
+
+triage = Triage()
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,57 @@
+import os
+import time
+import asyncio
+import logging
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger('ibkr')
+
+WARMUP = os.getenv("WARMUP", "true").lower() == "true"
+WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", 20))
+
+
+class Readiness:
+    # Startup timings: how long imports took, and which lazy components have
+    # been warmed (or failed to) since on_ready.
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.import_seconds = None
+        self.steps = {}
+
+    def imported(self):
+        self.import_seconds = time.perf_counter() - self.started
+
+    async def _step(self, name, fn):
+        begin = time.perf_counter()
+        self.steps[name] = ("warming", None)
+        try:
+            result = fn()
+            if asyncio.isawaitable(result):
+                await asyncio.wait_for(result, WARMUP_TIMEOUT)
+            self.steps[name] = ("ready", time.perf_counter() - begin)
+        except Exception as e:
+            self.steps[name] = (f"failed: {e}", time.perf_counter() - begin)
+        logger.info(f"🔥 Warm-up {name}: {self.steps[name][0]}")
+
+    async def warm_up(self, steps):
+        # steps: {name: callable returning None or an awaitable}. Blocking work
+        # belongs in the callable's own executor hop, not on the loop.
+        if not WARMUP:
+            return
+        await asyncio.gather(*[self._step(name, fn) for name, fn in steps.items()])
+        logger.info(self.report())
+
+    def report(self):
+        lines = ["🚦 Startup:"]
+        if self.import_seconds is not None:
+            lines.append(f"imports {self.import_seconds * 1000:.0f} ms")
+        for name, (state, seconds) in self.steps.items():
+            timing = f" ({seconds * 1000:.0f} ms)" if seconds is not None else ""
+            lines.append(f"{name}: {state}{timing}")
+        if not self.steps:
+            lines.append("warm-up " + ("pending" if WARMUP else "disabled"))
+        return "\n".join(lines)
+
+
+readiness = Readiness()
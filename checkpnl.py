@@ -1,23 +1,29 @@
-from ib_insync import IB, Option
+from bot.session import get_ib
+from bot.portfolio import current_snapshot
+from bot.marketdata import snapshot_quotes
+from bot.pnl import pnl
 
 def check_pnl():
-    ib = IB()
-    client_id = 10
-    ib.connect('127.0.0.1', 4001, clientId=client_id)
+    if pnl.ready:
+        # Streaming reqPnL values, no round trip
+        return pnl.report()
 
-    summary = {v.tag: v.value for v in ib.accountSummary()}
-    positions = ib.portfolio()
+    ib = get_ib()
 
-    for pos in positions:
-        contract = pos.contract
-        ticker = ib.reqMktData(contract, "", False, False)
-        ib.sleep(2)  # Let data flow in
-        print(f"📝 {contract.localSymbol} | Bid: {ticker.bid}, Ask: {ticker.ask}, Last: {ticker.last}, Close: {ticker.close}")
+    positions = current_snapshot(ib).records
+    # One batched quote request for the whole portfolio
+    quotes = ib.run(snapshot_quotes(ib, [pos.contract for pos in positions]))
 
-    total_unrealized_pnl = sum(pos.unrealizedPNL for pos in positions)
-    total_realized_pnl = sum(pos.realizedPNL for pos in positions)
+    marked = []
+    for pos in positions:
+        ticker = quotes.get(pos.con_id)
+        if ticker is not None:
+            print(f"📝 {pos.local_symbol} | Bid: {ticker.bid}, Ask: {ticker.ask}, Last: {ticker.last}, Close: {ticker.close}")
+            pos = pos.with_mark(ticker.marketPrice())
+        marked.append(pos)
 
-    ib.disconnect()
+    total_unrealized_pnl = sum(pos.unrealized_pnl for pos in marked)
+    total_realized_pnl = sum(pos.realized_pnl for pos in marked)
 
     result = (
         f"📊 Unrealized PnL: {total_unrealized_pnl:.2f} USD\n"
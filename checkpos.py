@@ -1,24 +1,17 @@
-from ib_insync import IB
-import time
+from bot.portfolio import current_snapshot
 
 def check_positions():
-    ib = IB()
-    ib.connect('127.0.0.1', 4001, clientId=4)
+    snapshot = current_snapshot()  # kept current by IB push updates
 
-    positions = ib.portfolio()  # includes marketPrice, marketValue, PnL info
-    ib.disconnect()
-    if not positions:
-        return "✅ No open positions."
+    if not snapshot.records:
+        return f"✅ No open positions. (v{snapshot.version}, {snapshot.age:.1f}s old)"
     else:
         lines = []
-        for pos in positions:
-            contract = pos.contract
+        for pos in snapshot.records:
             lines.append(
-                f"📌 {contract.localSymbol} | {contract.secType} | "
-                f"Position: {pos.position} | Avg Cost: {pos.averageCost:.10f} | "
-                f"Market Price: {pos.marketPrice:.10f} | Market Value: {pos.marketValue:.2f}"
+                f"📌 {pos.local_symbol} | {pos.sec_type} | "
+                f"Position: {pos.quantity} | Avg Cost: {pos.avg_cost:.10f} | "
+                f"Market Price: {pos.mark:.10f} | Market Value: {pos.market_value:.2f}"
             )
+        lines.append(f"🕒 v{snapshot.version} | {snapshot.age:.1f}s old")
         return "\n".join(lines)
-
-
-check_positions()
@@ -1,9 +1,9 @@
-from ib_insync import IB, Forex, MarketOrder
+from ib_insync import Forex, MarketOrder
+from bot.session import get_ib
 
 
 def convertcurrency():
-    ib = IB()
-    ib.connect('127.0.0.1', 4001, clientId=123)
+    ib = get_ib()
     # USDCAD is the proper symbol
     fx_contract = Forex('USDCAD')
 
@@ -25,6 +25,3 @@ def convertcurrency():
     # Let IB process
     ib.sleep(3)
     print(f"Order Status: {trade.orderStatus.status}")
-
-    # Disconnect
-    ib.disconnect()
\ No newline at end of file
@@ -1,4 +1,7 @@
+from bot.warmup import readiness
 from bot.core import start_bot
 
+readiness.imported()
+
 if __name__ == '__main__':
     start_bot()
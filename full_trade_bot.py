@@ -1,10 +1,8 @@
 import os
 import re
 import time
-import spacy
 import pytz
 import pyotp
-import nltk
 import pytesseract
 import logging
 from io import BytesIO
@@ -20,8 +18,18 @@ from dotenv import load_dotenv
 # ========== Setup ========== #
 logging.basicConfig(level=logging.INFO)
 load_dotenv()
-nltk.download('punkt')
-nlp = spacy.load("en_core_web_sm")
+_nlp = None
+
+
+def get_nlp():
+    # spaCy / NLTK are only needed by the fallback parser, load them on first use
+    global _nlp
+    if _nlp is None:
+        import nltk
+        import spacy
+        nltk.download('punkt', quiet=True)
+        _nlp = spacy.load("en_core_web_sm")
+    return _nlp
 
 DISCORD_TOKEN = os.getenv("DISCORD_TOKEN")
 USERNAME = os.getenv("WEBULL_USERNAME")
@@ -169,7 +177,7 @@ def parse_message(text):
 
     # Fallback logic using NLP to extract basic structure
     for line in text.splitlines():
-        tokens = [token.text for token in nlp(line)]
+        tokens = [token.text for token in get_nlp()(line)]
         potential_symbol = next((t for t in tokens if t.isalpha() and len(t) <= 5), None)
         potential_entry = next((t for t in tokens if re.fullmatch(r"\d+(\.\d+)?", t)), None)
 
@@ -1,22 +1,18 @@
-from ib_insync import IB
+from bot.session import get_ib
+from bot.journal import journal, day_start
 
 def list_contract_fills():
-    ib = IB()
-    ib.connect('127.0.0.1', 4001, clientId=48)
+    if not journal.attached:
+        journal.sync(get_ib())  # incremental, only fills newer than the journal cursor
 
-    execution_details = ib.reqExecutions()
     messages = []
 
-    for detail in execution_details:
-        contract = detail.contract
-        report = detail.execution
+    for time, local_symbol, side, shares, price, _ in journal.fills(start=day_start()):
         messages.append(
-            f"✅ {report.time} | {contract.localSymbol} | "
-            f"{report.side} {report.shares} @ ${report.price:.2f}"
+            f"✅ {time} | {local_symbol} | "
+            f"{side} {shares} @ ${price:.2f}"
         )
 
-    ib.disconnect()
-
     if messages:
         return "\n".join(messages)
     else:
@@ -78,98 +78,192 @@
 #
 
 import openai
-from httpx import HTTPStatusError
-from openai import OpenAI
+from openai import AsyncOpenAI
 from dotenv import load_dotenv
 import os
+import json
+import asyncio
 from datetime import datetime
-import time
-from ib_insync import IB
-
-# Create a dedicated IBKR connection for LLM logic
-ib_llm = IB()
-ib_llm.connect("127.0.0.1", 4001, clientId=2)
-
-# Verify connection
-if ib_llm.isConnected():
-    print("[LLM IBKR] Connected to IBKR with clientId=2")
-else:
-    print("[LLM IBKR] Failed to connect!")
+from bot.session import sessions
+from bot.portfolio import portfolio, current_snapshot
+from bot.llmcache import decisions, cache_key
+from bot.signals import TRADE_TOOL, TOOL_CHOICE, BATCH_TOOL, BATCH_TOOL_CHOICE, parse_signals, split_batch
+from bot.prompt import encode_positions, build_system_prompt, stats as prompt_stats
 
 load_dotenv()
 
+# Hard ceiling per signal for the async path, retries included
+LLM_DEADLINE = float(os.getenv("LLM_DEADLINE", 8))
+
 class LLM:
     def __init__(self, model_name: str = "gpt-4o"):
         self.model_name = model_name
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-    def fetch_ibkr_positions_string(self, ib=ib_llm):
-        positions = ib.positions()
-        summaries = [
-            f"{'LONG' if pos.position > 0 else 'SHORT'} {abs(pos.position)} "
-            f"{pos.contract.symbol} {pos.contract.right} {pos.contract.strike} {pos.contract.lastTradeDateOrContractMonth}"
-            for pos in positions if pos.position != 0
-        ]
-        return " | ".join(summaries) if summaries else "No open positions"
+        # Nothing connects until first use: importing this module is free
+        self._async_client = None
+
+    @property
+    def async_client(self):
+        # One pooled keep-alive client for the event loop; retries are ours
+        if self._async_client is None:
+            self._async_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+        return self._async_client
+
+    def fetch_ibkr_positions_string(self, ib=None):
+        # In-memory book once the portfolio store is streaming, compact and sorted.
+        # This runs on the bot's loop, so it never connects: without a stream it
+        # seeds from the trading session only if that is already connected.
+        if not portfolio.attached and ib is None:
+            ib = sessions.peek("trading")
+            if ib is None or not ib.isConnected():
+                return encode_positions([])
+        return encode_positions(current_snapshot(ib).records)
 
     def build_system_prompt(self, ibkr_summary):
-        return (
-            f"You are the best trader and an expert in quantitative options trading. "
-            f"Current IBKR open positions: {ibkr_summary}. "
-            f"You will be given a prompt containing any kind of message — it could be a direct trade alert, news update, or a speculative idea. "
-            f"Your task is to carefully analyze the message and infer whether the most appropriate action is one of the following: "
-            f"(1) BUY — if the message contains a clear, actionable trade entry signal, or if it starts with day trade: for example,Daytrade Contract: QQQ 6/23 525P Entry: 1.24"
-            f"(2) SELL — if the message recommends trimming, taking profit, or exiting a position, or even SL to be or profit (stoploss to breakeven, you would sell in this case too); "
-            f"(3) SPECULATE — if the message is commentary or watch-only. "
-            f"The action can only be one of BUY, SELL, and SPECULATE. "
-            f"You can only return SELL if your current holding of this quantity is strictly larger than 0. "
-            f"If relevant, extract: symbol, contract_type (call or put), expiry (YYYYMMDD), strike (int), quantity (int). "
-            f"Quantity for BUY is 4 unless specified. Quantity for SELL is 1 unless specified."
-            f"comments like closed all, out of the rest, runners left, sl to be, last trim for me means sell ALL position rest of the contracts from the ibkr summary. talking about bad PA, or saying there you go is NOT a sell trigger"
-            f"if any field is missing but the current IBKR open positions contain a symbol AND an option type (call/put) that matches the symbol in the message,"
-            f"you should infer the missing fields from the IBKR open positions. "
-            f"For example, if you have QQQ 9/8 525 call in your IBKR positions, and my message says 'trim qqq calls', "
-            f"you should return: symbol: QQQ, contract_type: C, expiry: 20250908, strike: 525, action: SELL, quantity: 1"
-            f"but if it says trim puts, then you shouldn't return a sell trigger."
-            "if a loss is taken (eg. a negative percent return like -20%, then the entire position for that contract should be closed. if you have 3 contracts and a loss is taken, then all 3 should be sold"
-            f"If no reasonable match exists, or if no position qualifies for SELL, return: symbol: N/A, contract_type: N/A, expiry: N/A, strike: N/A, action: SPECULATE, quantity: N/A"
-            f"If no symbol is explicitly mentioned in the message and there is more than one open position, you must return: symbol: N/A, contract_type: N/A, expiry: N/A, strike: N/A, action: SPECULATE, quantity: N/A. Only infer the symbol if there is exactly one open position with words like personally going to add more here"
-            f"The expiry must be 2025 unless I explicitly specify otherwise. If unsure, default to a valid 2025 expiry date."
+        return build_system_prompt(ibkr_summary)
+
+    def cached(self, user_prompt: str, ib=None):
+        # Decision already made for this message against the current positions
+        output = decisions.get(cache_key(user_prompt, self.fetch_ibkr_positions_string(ib)))
+        if output is not None:
+            print("[LLM] Cache hit:", output)
+        return output
+
+    def request(self, system_prompt, user_prompt, tool=TRADE_TOOL, tool_choice=TOOL_CHOICE, max_tokens=120):
+        return dict(
+            model=self.model_name,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            tools=[tool],
+            tool_choice=tool_choice,
+            max_tokens=max_tokens,
+            temperature=0.3
         )
 
-    def prompt(self, user_prompt: str, ib=ib_llm):
-        ibkr_summary = self.fetch_ibkr_positions_string(ib)
-        system_prompt = self.build_system_prompt(ibkr_summary)
+    async def _stream_arguments(self, request):
+        # Streams the tool call and returns as soon as its JSON is complete.
+        # The provider's usage, cached tokens included, only comes in the last
+        # chunk, so the rest of the stream is drained in the background.
+        stream = await self.async_client.chat.completions.create(
+            **request, stream=True, stream_options={"include_usage": True}
+        )
+        chunks = stream.__aiter__()
+        arguments = ""
+        complete = False
+        try:
+            async for chunk in chunks:
+                if chunk.usage is not None:
+                    prompt_stats.usage(chunk.usage)
+                if not chunk.choices:
+                    continue
+                for call in chunk.choices[0].delta.tool_calls or []:
+                    arguments += call.function.arguments or ""
+                if arguments.rstrip().endswith("}"):
+                    try:
+                        json.loads(arguments)
+                        complete = True
+                        break
+                    except ValueError:
+                        pass
+        except BaseException:
+            await stream.close()
+            raise
+        if complete:
+            asyncio.ensure_future(self._drain_usage(stream, chunks))
+        else:
+            await stream.close()
+        return arguments
+
+    async def _drain_usage(self, stream, chunks, timeout=5):
+        async def drain():
+            async for chunk in chunks:
+                if chunk.usage is not None:
+                    prompt_stats.usage(chunk.usage)
+        try:
+            await asyncio.wait_for(drain(), timeout)
+        except Exception as e:
+            print(f"[LLM] Usage not read: {e}")
+        finally:
+            await stream.close()
 
-        max_retries = 5
-        for attempt in range(max_retries):
+    async def _acall(self, request, deadline):
+        loop = asyncio.get_running_loop()
+        give_up = loop.time() + deadline
+        attempt = 0
+        while True:
+            remaining = give_up - loop.time()
+            if remaining <= 0:
+                return "Error: LLM deadline exceeded."
             try:
-                response = self.client.chat.completions.create(
-                    model=self.model_name,
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt}
-                    ],
-                    max_tokens=250,
-                    temperature=0.3
-                )
-                break
+                return await asyncio.wait_for(self._stream_arguments(request), remaining)
             except openai.RateLimitError as e:
-                retry_after = int(e.response.headers.get("Retry-After", 2 ** attempt))
+                retry_after = float(e.response.headers.get("Retry-After", 2 ** attempt))
+                attempt += 1
+                if retry_after >= give_up - loop.time():
+                    return "Error: Rate limited past deadline."
                 print(f"[429] Rate limited. Retry after {retry_after}s...")
-                time.sleep(retry_after)
-            except HTTPStatusError as e:
-                print(f"[HTTP ERROR] {e}")
-                return f"HTTP Error: {e}"
+                await asyncio.sleep(retry_after)
+            except asyncio.TimeoutError:
+                return "Error: LLM deadline exceeded."
             except Exception as e:
                 print(f"[ERROR] {e}")
                 return f"Error: {e}"
-        else:
-            return "Error: Max retries exceeded."
 
-        output = response.choices[0].message.content.strip()
+    async def aprompt(self, user_prompt: str, ib=None, deadline=LLM_DEADLINE):
+        ibkr_summary = self.fetch_ibkr_positions_string(ib)
+
+        cached = decisions.get(cache_key(user_prompt, ibkr_summary))
+        if cached is not None:
+            print("[LLM] Cache hit:", cached)
+            return cached
+        return await self._ask(user_prompt, ibkr_summary, deadline)
+
+    async def _ask(self, user_prompt, ibkr_summary, deadline):
+        # Always a network call; the answer stands on its own, so it is cached
+        system_prompt = self.build_system_prompt(ibkr_summary)
+        output = await self._acall(self.request(system_prompt, user_prompt), deadline)
+        if output.startswith(("Error", "HTTP Error")):
+            return output
+
+        prompt_stats.record(system_prompt, user_prompt)
         print("[LLM] LLM Output:", output)
+        decisions.put(cache_key(user_prompt, ibkr_summary), output)
         return output
 
-llm=LLM()
-print(llm.prompt("USER MESSAGE: Sell 2 qqq"))
\ No newline at end of file
+    async def aprompt_batch(self, user_prompts, ib=None, deadline=LLM_DEADLINE):
+        # One round trip for a burst, returns report_trades arguments per message
+        # in order. Callers check cached() first. A message read next to its
+        # neighbours can be decided differently than on its own, so batch
+        # answers never go into the per-message decision cache.
+        ibkr_summary = self.fetch_ibkr_positions_string(ib)
+        if len(user_prompts) <= 1:
+            return [await self._ask(text, ibkr_summary, deadline) for text in user_prompts]
+
+        system_prompt = self.build_system_prompt(ibkr_summary)
+        user_prompt = (
+            "Several messages follow, numbered in the order they were posted. "
+            "Call report_batch with one entry per message index.\n"
+            + "\n".join(f"MESSAGE {n}: {text}" for n, text in enumerate(user_prompts, 1))
+        )
+        request = self.request(system_prompt, user_prompt, BATCH_TOOL, BATCH_TOOL_CHOICE, 120 * len(user_prompts))
+        output = await self._acall(request, deadline)
+        if output.startswith(("Error", "HTTP Error")):
+            return [output] * len(user_prompts)
+
+        prompt_stats.record(system_prompt, user_prompt)
+        print(f"[LLM] Batch of {len(user_prompts)} output:", output)
+        return [
+            "Error: Message missing from batch." if arguments is None else arguments
+            for arguments in split_batch(output, len(user_prompts))
+        ]
+
+    async def aextract_batch(self, user_prompts, ib=None, deadline=LLM_DEADLINE):
+        outputs = await self.aprompt_batch(user_prompts, ib, deadline)
+        return [
+            [] if output.startswith(("Error", "HTTP Error")) else parse_signals(output)
+            for output in outputs
+        ]
+
+if __name__ == "__main__":
+    print(asyncio.run(LLM().aprompt("USER MESSAGE: Sell 2 qqq")))
\ No newline at end of file
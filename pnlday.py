@@ -1,22 +1,21 @@
-from ib_insync import IB
-from datetime import datetime
+from bot.session import get_ib
+from bot.pnl import pnl
+from bot.journal import journal, day_start, week_start
 
 def get_realized_pnl_today():
-    ib = IB()
-    ib.connect('127.0.0.1', 4001, clientId=79)
+    if pnl.ready:
+        return f"✅ Realized PnL today: {pnl.state.realized:.2f}"
 
-    now = datetime.now()
-    today = now.date()
-    executions = ib.reqExecutions()
+    if not journal.attached:
+        journal.sync(get_ib())
+    total_realized, _ = journal.realized_pnl(start=day_start())
 
-    total_realized = 0.0
+    return f"✅ Realized PnL today: {total_realized:.2f}"
 
-    for exec_detail in executions:
-        exec_date = exec_detail.execution.time.date()  # no astimezone()
-        if exec_date == today:
-            report = exec_detail.commissionReport
-            if report and report.realizedPNL is not None:
-                total_realized += report.realizedPNL
+def get_realized_pnl_week(symbol=None):
+    if not journal.attached:
+        journal.sync(get_ib())
+    total_realized, commission = journal.realized_pnl(start=week_start(), symbol=symbol)
 
-    ib.disconnect()
-    return f"✅ Realized PnL today: {total_realized:.2f}"
+    label = f" {symbol.upper()}" if symbol else ""
+    return f"✅ Realized{label} PnL this week: {total_realized:.2f} (commissions {commission:.2f})"
@@ -1,8 +1,7 @@
-from ib_insync import IB
+from bot.session import get_ib
 
 def queuelookup():
-    ib = IB()
-    ib.connect("127.0.0.1", 4001, clientId=10)
+    ib = get_ib()
 
     ib.reqOpenOrders()  # Request all current open orders
     ib.sleep(1)  # Give IBKR a second to respond
@@ -10,7 +9,6 @@ def queuelookup():
     open_orders = ib.openOrders()
 
     if not open_orders:
-        ib.disconnect()
         return "✅ No open orders at IBKR."
 
     lines = []
@@ -19,5 +17,4 @@ def queuelookup():
             f"📌 OrderId: {o.orderId} | {o.action} {o.totalQuantity} {o.orderType} | Status: {o.orderStatus.status}"
         )
 
-    ib.disconnect()
     return "\n".join(lines)